@@ -2,38 +2,103 @@
 Model utilities and initialization for AI Video Generator.
 """
 import os
-import torch
-from dotenv import load_dotenv
+from dataclasses import dataclass
+from functools import lru_cache
+from types import MappingProxyType
 
-load_dotenv()
+# Names resolved on first access so that importing the package (e.g. just
+# to read AVAILABLE_MODELS) does not pay for torch import and CUDA init.
+_BACKEND_ATTRS = (
+    "get_device", "get_torch_dtype", "DEVICE", "DTYPE",
+    "CC_MAJOR", "CC_MINOR", "SM_COUNT", "TENSOR_CORES_AVAILABLE", "BF16_SUPPORTED",
+    "get_pinned_buffer", "release_pinned_buffer", "clean_ipc",
+    "mixed_precision", "inference",
+)
 
-# Get HuggingFace token
-HF_TOKEN = os.getenv("HF_TOKEN")
 
-def get_device():
-    """Get the best available device."""
-    if torch.cuda.is_available():
-        return "cuda"
-    elif hasattr(torch.backends, "mps") and torch.backends.mps.is_available():
-        return "mps"
-    return "cpu"
+def __getattr__(name):
+    """Lazily resolve torch- and environment-dependent attributes (PEP 562)."""
+    if name in _BACKEND_ATTRS:
+        _ensure_env()
+        from . import _backend
+        value = getattr(_backend, name)
+    elif name == "HF_TOKEN":
+        value = get_hf_token()
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
 
-def get_torch_dtype():
-    """Get optimal torch dtype based on device."""
-    if torch.cuda.is_available():
+
+@lru_cache(maxsize=1)
+def _ensure_env():
+    """
+    Load .env once, on first use of the package's environment-dependent names.
+    
+    The whole file is loaded (e.g. FIREBASE_KEY_PATH for the cloud worker),
+    not just the token; variables already set in the environment win.
+    """
+    from dotenv import load_dotenv
+    load_dotenv()
+
+
+@lru_cache(maxsize=1)
+def get_hf_token():
+    """
+    Get the HuggingFace token, resolved only once per process.
+    
+    Checks HF_TOKEN, then HUGGINGFACE_HUB_TOKEN, then the token cached on
+    disk by `huggingface-cli login`.
+    """
+    _ensure_env()
+    token = os.environ.get("HF_TOKEN") or os.environ.get("HUGGINGFACE_HUB_TOKEN")
+    if token:
+        return token
+    try:
+        from huggingface_hub import HfFolder
+        return HfFolder.get_token()
+    except ImportError:
+        return None
+
+
+@dataclass(frozen=True)
+class ModelSpec:
+    """Static metadata for a supported model."""
+    __slots__ = ("name", "repo", "description", "vram", "type", "preferred_dtype")
+    name: str
+    repo: str
+    description: str
+    vram: str
+    type: str
+    preferred_dtype: str  # torch dtype name the weights are meant to run in
+
+
+# Available models (read-only registry)
+AVAILABLE_MODELS = MappingProxyType({
+    "modelscope": ModelSpec(
+        name="Alibaba DAMO T2V",
+        repo="damo-vilab/text-to-video-ms-1.7b",
+        description="Alibaba DAMO text-to-video synthesis model",
+        vram="~8GB",
+        type="text2video",
+        preferred_dtype="float16"
+    )
+})
+
+
+def resolve_dtype(spec: ModelSpec):
+    """
+    Get the torch dtype to load a model in on the current device.
+    
+    Returns the model's preferred dtype when the device can run it, falling
+    back to float16 where bfloat16 is unsupported and to float32 off CUDA.
+    """
+    import torch
+    from ._backend import DEVICE, TENSOR_CORES_AVAILABLE, BF16_SUPPORTED
+    
+    if DEVICE != "cuda" or not TENSOR_CORES_AVAILABLE:
+        return torch.float32
+    preferred = getattr(torch, spec.preferred_dtype)
+    if preferred == torch.bfloat16 and not BF16_SUPPORTED:
         return torch.float16
-    return torch.float32
-
-DEVICE = get_device()
-DTYPE = get_torch_dtype()
-
-# Available models
-AVAILABLE_MODELS = {
-    "modelscope": {
-        "name": "Alibaba DAMO T2V",
-        "repo": "damo-vilab/text-to-video-ms-1.7b",
-        "description": "Alibaba DAMO text-to-video synthesis model",
-        "vram": "~8GB",
-        "type": "text2video"
-    }
-}
+    return preferred
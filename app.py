@@ -2,7 +2,10 @@ import streamlit as st
 import os
 import time
 import json
+import html
+import base64
 from pathlib import Path
+from types import MappingProxyType
 from datetime import datetime
 from dotenv import load_dotenv
 
@@ -15,14 +18,233 @@ from utils.user_auth import (
 # Load environment variables
 load_dotenv()
 
+# Local mode needs PyTorch (a sys.modules hit after the first run)
+try:
+    import torch
+    _TORCH_AVAILABLE = True
+except ImportError:
+    _TORCH_AVAILABLE = False
+
+# Frame post-processing libraries (absent on slim cloud installs)
+try:
+    import numpy as np
+    import PIL.Image
+except ImportError:
+    np = None
+
+
+@st.cache_resource(show_spinner=False)
+def _probe_cuda() -> bool:
+    """
+    Probe CUDA once per server process.
+    
+    Streamlit re-executes this script on every interaction, so module-level
+    caches (lru_cache included) are rebuilt per rerun; cache_resource is not.
+    """
+    return _TORCH_AVAILABLE and torch.cuda.is_available()
+
+
+_CUDA_OK = _probe_cuda()
+
+
+@st.cache_resource(show_spinner=False)
+def _start_warmup():
+    """
+    Warm the HF video model and the LLAMA client once per server process.
+    
+    Runs on background threads so the UI renders meanwhile, and the first
+    user's request does not pay the cold start. Set AIVG_WARMUP=0 to skip.
+    """
+    import threading
+    
+    def warm_hf():
+        from utils.hf_inference import get_hf_generator
+        get_hf_generator().warmup()
+    
+    def warm_llama():
+        from models.llama_prompt_generator import get_llama_generator
+        get_llama_generator().warmup()
+    
+    if os.environ.get("AIVG_WARMUP", "1") == "1":
+        for target in (warm_hf, warm_llama):
+            threading.Thread(target=target, name=f"aivg-{target.__name__}", daemon=True).start()
+
+
+_start_warmup()
+
+# Sidebar device badge
+if _CUDA_OK:
+    _DEVICE_LABEL = "🟢 CUDA (GPU)"
+elif _TORCH_AVAILABLE:
+    _DEVICE_LABEL = "🟡 CPU (Slow)"
+else:
+    _DEVICE_LABEL = "☁️ Cloud Mode (No local GPU)"
+
+
+@st.cache_resource(show_spinner=False)
+def _get_modelscope():
+    """Get the ModelScope generator, built once per server process."""
+    from models.modelscope import get_modelscope_generator
+    return get_modelscope_generator()
+
+
+@st.cache_resource(show_spinner=False)
+def _get_hf_generate():
+    """Get the HuggingFace cloud generation entry point."""
+    from utils.hf_inference import generate_video_hf
+    return generate_video_hf
+
+
+@st.cache_resource(show_spinner=False)
+def _get_error_agent():
+    """Get the error-fixing agent, built once per server process."""
+    from models.error_fixing_agent import get_error_agent
+    return get_error_agent()
+
+
+@st.cache_resource(show_spinner=False)
+def _get_io_pool():
+    """
+    Get the background writer for history/CSV records.
+    
+    One worker keeps writes to the same file ordered. Pending writes are
+    still flushed at interpreter exit, since concurrent.futures joins its
+    workers then.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix="history-io")
+
+
+def _save_in_background(save_fn, label: str, **kwargs):
+    """Run save_fn(**kwargs) off the script thread, logging failures."""
+    def report(future):
+        if future.exception() is not None:
+            print(f"{label} save skipped: {future.exception()}")
+    
+    _get_io_pool().submit(save_fn, **kwargs).add_done_callback(report)
+
 # Video quality presets
-VIDEO_QUALITY = {
+VIDEO_QUALITY = MappingProxyType({
     "240p": {"width": 426, "height": 240},
     "540p": {"width": 960, "height": 540},
     "720p": {"width": 1280, "height": 720},
     "1080p": {"width": 1920, "height": 1080},
     "1440p": {"width": 2560, "height": 1440}
-}
+})
+
+# Sidebar option tables (built once, reused by every rerun)
+_MODEL_OPTIONS = MappingProxyType({
+    "DAMO T2V (1.7B) - Offline": {
+        "id": "damo-vilab/text-to-video-ms-1.7b",
+        "vram": "~8GB",
+        "desc": "Alibaba DAMO model. Stable, well-tested. Works 100% offline.",
+        "icon": "📊"
+    }
+})
+
+_RATIO_OPTIONS = MappingProxyType({
+    "16:9 (Laptop/TV)": (16, 9),
+    "9:16 (Mobile/Reels)": (9, 16),
+    "1:1 (Square)": (1, 1),
+    "4:3 (Classic)": (4, 3)
+})
+
+_QUALITY_OPTIONS = ("Low (Fast)", "Medium (Balanced)", "High (Slow)")
+
+_QUALITY_PRESETS = MappingProxyType({
+    "Normal": {"width": 256, "height": 256, "steps_boost": 0, "desc": "Fast preview", "vram": "4GB"},
+    "Medium": {"width": 384, "height": 384, "steps_boost": 5, "desc": "Balanced", "vram": "6GB"},
+    "Standard": {"width": 512, "height": 512, "steps_boost": 10, "desc": "Good quality", "vram": "8GB"},
+    "HD 720p": {"width": 1280, "height": 720, "steps_boost": 15, "desc": "HD quality", "vram": "12GB"},
+    "Full HD 1080p": {"width": 1920, "height": 1080, "steps_boost": 20, "desc": "Full HD", "vram": "16GB"},
+    "QHD 1440p": {"width": 2560, "height": 1440, "steps_boost": 25, "desc": "Ultra HD", "vram": "24GB+"},
+})
+
+# HD options that require warning on local mode
+_HIGH_VRAM_OPTIONS = frozenset({"HD 720p", "Full HD 1080p", "QHD 1440p"})
+
+# Frame limit for 8GB GPU to prevent OOM
+_MAX_SAFE_FRAMES = 90
+
+# Base dimensions (approximate) per quality setting
+_BASE_DIMS = MappingProxyType({
+    "Low (Fast)": 384,
+    "Medium (Balanced)": 512,
+    "High (Slow)": 640,
+})
+
+
+@st.cache_resource(show_spinner=False)
+def _build_dims_table():
+    """
+    Precompute the aspect-ratio preview size for every ratio/quality pair.
+    
+    There are only len(_RATIO_OPTIONS) x len(_QUALITY_OPTIONS) combinations,
+    so the sidebar does one dict lookup instead of the arithmetic. Built
+    once per process (the script body reruns on every interaction).
+    
+    Returns:
+        Read-only mapping of (aspect_ratio, quality_setting) -> (width, height)
+    """
+    table = {}
+    for aspect_ratio, ar_val in _RATIO_OPTIONS.items():
+        for quality_setting in _QUALITY_OPTIONS:
+            base_dim = _BASE_DIMS[quality_setting]
+            
+            # Calculate W/H maintaining AR
+            if ar_val[0] > ar_val[1]: # Landscape
+                width = base_dim
+                height = int(base_dim * (ar_val[1] / ar_val[0]))
+            elif ar_val[0] < ar_val[1]: # Portrait
+                height = base_dim
+                width = int(base_dim * (ar_val[0] / ar_val[1]))
+            else: # Square
+                width = base_dim
+                height = base_dim
+            
+            # Ensure divisible by 16 (common ML requirement)
+            table[(aspect_ratio, quality_setting)] = ((width // 16) * 16, (height // 16) * 16)
+    return MappingProxyType(table)
+
+
+_DIMS_TABLE = _build_dims_table()
+
+
+def _derive_dims(aspect_ratio: str, quality_setting: str, duration: int, fps: int,
+                 quality_preset: str, num_steps: int) -> dict:
+    """
+    Derive output size, frame count and step count from the sidebar inputs.
+    
+    Sizes come from the precomputed _DIMS_TABLE and _QUALITY_PRESETS, leaving
+    only the frame cap and step boost to compute per rerun.
+    
+    Returns:
+        Dict with ar_width/ar_height (aspect-ratio preview size), width,
+        height, num_frames, real_duration, frames_capped and num_steps
+    """
+    ar_width, ar_height = _DIMS_TABLE[(aspect_ratio, quality_setting)]
+    
+    # Calculate Frames
+    num_frames = duration * fps
+    frames_capped = num_frames > _MAX_SAFE_FRAMES
+    if frames_capped:
+        num_frames = _MAX_SAFE_FRAMES
+        real_duration = num_frames / fps
+    else:
+        real_duration = duration
+    
+    # Apply quality preset to dimensions, boost steps for higher quality
+    preset = _QUALITY_PRESETS[quality_preset]
+    return {
+        "ar_width": ar_width,
+        "ar_height": ar_height,
+        "width": preset["width"],
+        "height": preset["height"],
+        "num_frames": num_frames,
+        "real_duration": real_duration,
+        "frames_capped": frames_capped,
+        "num_steps": min(50, num_steps + preset["steps_boost"]),
+    }
 
 # Page configuration - sidebar always visible
 st.set_page_config(
@@ -33,7 +255,7 @@ st.set_page_config(
 )
 
 # Custom CSS for sidebar styling and toggle button
-st.markdown("""
+_CSS = """
 <style>
     @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap');
     
@@ -184,7 +406,78 @@ st.markdown("""
     
     #MainMenu, footer { visibility: hidden; }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+# st.html injects raw HTML without the markdown parser. Streamlit drops
+# elements that are not re-emitted, so this still runs on every rerun.
+st.html(_CSS)
+
+
+@st.cache_data(show_spinner=False)
+def _cached_history():
+    """Load history from disk; cleared whenever a new entry is saved."""
+    from utils.storage import load_history
+    return load_history()
+
+
+# Model-call memos. Keyed on the prompt (plus duration for subtitles) and
+# persisted to disk, so regenerating the same prompt skips the multi-second
+# translation/LLM calls even across restarts. The memoized functions take no
+# progress callback: cache hits replay st.* calls, and a status placeholder
+# created outside the function can not be replayed. Disk-persisted entries
+# never expire, so default/fallback results are raised out as _Uncached
+# instead of being stored; use _memo() to call these functions.
+class _Uncached(Exception):
+    """Carries a result out of a cached function without memoizing it."""
+    
+    def __init__(self, value):
+        super().__init__("result not cached")
+        self.value = value
+
+
+def _memo(cached_fn, *args):
+    """Call a memoized model function, passing uncached fallback results through."""
+    try:
+        return cached_fn(*args)
+    except _Uncached as e:
+        return e.value
+
+
+@st.cache_data(persist="disk", show_spinner=False, max_entries=256)
+def _cached_translation(prompt: str) -> dict:
+    """Translate a prompt to English (memoized per prompt, translations only)."""
+    from models.translator import get_translator
+    result = get_translator().translate_to_english(prompt)
+    # Not translated may also mean language detection failed and
+    # defaulted to English, so only real translations are kept
+    if not result.get("was_translated"):
+        raise _Uncached(result)
+    return result
+
+
+@st.cache_data(persist="disk", show_spinner=False, max_entries=256)
+def _cached_llama_refinement(prompt: str) -> tuple:
+    """Run LLAMA analysis and video-prompt generation (memoized per prompt)."""
+    from models.llama_prompt_generator import get_llama_generator, is_default_result
+    llama_gen = get_llama_generator()
+    analysis_data = llama_gen.analyze_prompt(prompt)
+    enhanced_config = llama_gen.generate_video_prompt(analysis_data, prompt)
+    if is_default_result(analysis_data) or is_default_result(enhanced_config):
+        raise _Uncached((analysis_data, enhanced_config))
+    return analysis_data, enhanced_config
+
+
+@st.cache_data(persist="disk", show_spinner=False, max_entries=256)
+def _cached_subtitles(prompt: str, duration_seconds: float) -> list:
+    """Generate subtitle segments for a prompt and duration (memoized)."""
+    from models.subtitle_generator import generate_video_subtitles
+    subtitles, from_model = generate_video_subtitles(
+        prompt=prompt, duration_seconds=duration_seconds, with_source=True
+    )
+    # Word-split fallback (no model, model error or unparseable output)
+    if not from_model:
+        raise _Uncached(subtitles)
+    return subtitles
 
 
 def init_session_state():
@@ -213,8 +506,7 @@ def init_session_state():
             st.session_state[key] = value
     
     if "history" not in st.session_state:
-        from utils.storage import load_history
-        st.session_state.history = load_history()
+        st.session_state.history = _cached_history()
 
 
 def set_example_prompt(prompt: str):
@@ -224,14 +516,25 @@ def set_example_prompt(prompt: str):
 
 def render_error_panel():
     """Display error panel with 'Auto fix with AI' button when errors occur."""
-    if not st.session_state.get("current_error"):
+    error_msg = st.session_state.get("current_error")
+    if not error_msg:
         return
     
-    error_msg = st.session_state.current_error
     analysis = st.session_state.get("error_analysis")
     
-    # Error container with distinct styling
-    st.markdown("""
+    shown_msg = error_msg[:300] + "..." if len(error_msg) > 300 else error_msg
+    analysis_html = ""
+    if analysis:
+        analysis_html = f"""
+        <div style="margin: 1rem 0; padding: 0.75rem; background: rgba(0,0,0,0.2); border-radius: 8px;">
+            <div style="font-size: 0.85rem; color: #94a3b8;">
+                <strong>🔍 Root Cause:</strong> {html.escape(str(analysis.get('root_cause', 'Unknown')))}<br>
+                <strong>💡 Suggested Fix:</strong> {html.escape(str(analysis.get('fix_suggestion', 'Retry the operation')))}
+            </div>
+        </div>"""
+    
+    # Header, error message and analysis in one raw-HTML element
+    st.html(f"""
     <div style="
         background: linear-gradient(135deg, rgba(239,68,68,0.15), rgba(220,38,38,0.1));
         border: 1px solid rgba(239,68,68,0.4);
@@ -243,21 +546,9 @@ def render_error_panel():
             <span style="font-size: 1.5rem; margin-right: 0.5rem;">⚠️</span>
             <span style="font-size: 1.1rem; font-weight: 600; color: #ef4444;">Error Detected</span>
         </div>
-    """, unsafe_allow_html=True)
-    
-    # Show error message
-    st.code(error_msg[:300] + "..." if len(error_msg) > 300 else error_msg, language="text")
-    
-    # Show analysis if available
-    if analysis:
-        st.markdown(f"""
-        <div style="margin: 1rem 0; padding: 0.75rem; background: rgba(0,0,0,0.2); border-radius: 8px;">
-            <div style="font-size: 0.85rem; color: #94a3b8;">
-                <strong>🔍 Root Cause:</strong> {analysis.get('root_cause', 'Unknown')}<br>
-                <strong>💡 Suggested Fix:</strong> {analysis.get('fix_suggestion', 'Retry the operation')}
-            </div>
-        </div>
-        """, unsafe_allow_html=True)
+        <pre style="white-space: pre-wrap; margin: 0; padding: 0.75rem; background: rgba(0,0,0,0.3); border-radius: 8px; color: #e2e8f0; font-size: 0.8rem;">{html.escape(shown_msg)}</pre>{analysis_html}
+    </div>
+    """)
     
     col1, col2 = st.columns([2, 1])
     
@@ -267,8 +558,7 @@ def render_error_panel():
             
             with st.spinner("🧠 Loading Qwen 3 Coder agent..."):
                 try:
-                    from models.error_fixing_agent import get_error_agent
-                    agent = get_error_agent()
+                    agent = _get_error_agent()
                     
                     # Try to load the model (downloads on first use)
                     st.info("📥 First time: Downloading Qwen 3 Coder model for offline use...")
@@ -281,7 +571,9 @@ def render_error_panel():
                     
                     # Analyze and fix
                     if not analysis:
-                        analysis = agent.analyze_error(error_msg, {"source": "ui"})
+                        context = st.session_state.get("error_context") or {"source": "ui"}
+                        analysis = agent.analyze_error(error_msg, context)
+                        st.session_state.error_analysis = analysis
                     
                     fix_result = agent.attempt_auto_fix(analysis, {"source": "ui"})
                     
@@ -315,20 +607,15 @@ def render_error_panel():
             st.session_state.current_error = None
             st.session_state.error_analysis = None
             st.rerun()
-    
-    st.markdown("</div>", unsafe_allow_html=True)
 
 
 def capture_error(error_msg: str, context: dict = None):
     """Capture an error for display in the UI with auto-fix option."""
-    from models.error_fixing_agent import get_error_agent
-    
     st.session_state.current_error = str(error_msg)
-    
-    # Analyze error immediately
-    agent = get_error_agent()
-    analysis = agent.analyze_error(str(error_msg), context or {})
-    st.session_state.error_analysis = analysis
+    st.session_state.error_context = context or {}
+    # Analysis is deferred to the Auto fix button so dismissed errors never
+    # load the agent
+    st.session_state.error_analysis = None
 
 
 def render_header():
@@ -364,14 +651,8 @@ def render_sidebar():
         
         st.markdown("### ⚙️ Settings")
 
-        try:
-            import torch
-            local_available = True
-        except ImportError:
-            local_available = False
-        
         # Runtime Mode Selector
-        if local_available:
+        if _TORCH_AVAILABLE:
             mode = st.radio(
                 "🚀 Execution Mode",
                 ["Local (Offline)", "Cloud (Faster)"],
@@ -387,23 +668,14 @@ def render_sidebar():
             # Model Selection
             st.markdown("#### 🤖 AI Model")
             
-            model_options = {
-                "DAMO T2V (1.7B) - Offline": {
-                    "id": "damo-vilab/text-to-video-ms-1.7b",
-                    "vram": "~8GB",
-                    "desc": "Alibaba DAMO model. Stable, well-tested. Works 100% offline.",
-                    "icon": "📊"
-                }
-            }
-            
             selected_model = st.selectbox(
                 "Select Model",
-                list(model_options.keys()),
+                tuple(_MODEL_OPTIONS),
                 index=0,
                 help="DAMO model - works offline"
             )
             
-            model_info = model_options[selected_model]
+            model_info = _MODEL_OPTIONS[selected_model]
             
             st.markdown(f"""
             <div class="model-card">
@@ -432,166 +704,143 @@ def render_sidebar():
         
         st.markdown("---")
         
-        # Aspect Ratio & Quality
-        st.markdown("#### 📐 Format & Quality")
-        
-        # Aspect Ratio
-        ratio_options = {
-            "16:9 (Laptop/TV)": (16, 9),
-            "9:16 (Mobile/Reels)": (9, 16),
-            "1:1 (Square)": (1, 1),
-            "4:3 (Classic)": (4, 3)
-        }
-        aspect_ratio = st.selectbox("Aspect Ratio", options=list(ratio_options.keys()), index=0)
-        ar_val = ratio_options[aspect_ratio]
-        
-        # Quality (Resolution) - Dynamic based on AR
-        quality_options = ["Low (Fast)", "Medium (Balanced)", "High (Slow)"]
-        quality_setting = st.select_slider("Quality Preset", options=quality_options, value="Medium (Balanced)")
-        
-        # Base dimensions (approximate)
-        if quality_setting == "Low (Fast)":
-            base_dim = 384
-        elif quality_setting == "Medium (Balanced)":
-            base_dim = 512
-        else:
-            base_dim = 640
+        # Widgets are batched in a form: tweaking them does not rerun the
+        # app until Apply is pressed
+        with st.form("sidebar_settings", border=False):
+            # Aspect Ratio & Quality
+            st.markdown("#### 📐 Format & Quality")
             
-        # Calculate W/H maintaining AR
-        if ar_val[0] > ar_val[1]: # Landscape
-            width = base_dim
-            height = int(base_dim * (ar_val[1] / ar_val[0]))
-        elif ar_val[0] < ar_val[1]: # Portrait
-            height = base_dim
-            width = int(base_dim * (ar_val[0] / ar_val[1]))
-        else: # Square
-            width = base_dim
-            height = base_dim
+            # Aspect Ratio
+            aspect_ratio = st.selectbox("Aspect Ratio", options=tuple(_RATIO_OPTIONS), index=0)
             
-        # Ensure divisible by 16 (common ML requirement)
-        width = (width // 16) * 16
-        height = (height // 16) * 16
-        
-        st.caption(f"📏 Output Size: **{width}x{height}**")
-        
-        st.markdown("---")
-        
-        # Duration & FPS
-        st.markdown("#### ⏱️ Duration & Motion")
-        
-        target_duration = st.select_slider(
-            "Video Length (Seconds)", 
-            options=[2, 3, 4, 5, 8], 
-            value=4,
-            help="Longer videos require more memory and time."
-        )
-        
-        fps = st.slider("FPS (Smoothness)", 8, 24, 8) # Increased max FPS to 24 for smoother video
-        
-        # Calculate Frames
-        # Frame limit for 8GB GPU to prevent OOM
-        MAX_SAFE_FRAMES = 90
-        num_frames = target_duration * fps
-        
-        if num_frames > MAX_SAFE_FRAMES:
-            st.warning(f"⚠️ Limit: 90 frames (approx {MAX_SAFE_FRAMES/fps:.1f}s at {fps} FPS) to prevent crashing.")
-            num_frames = MAX_SAFE_FRAMES
-            real_duration = num_frames / fps
-        else:
-            real_duration = target_duration
+            # Quality (Resolution) - Dynamic based on AR
+            quality_setting = st.select_slider("Quality Preset", options=_QUALITY_OPTIONS, value="Medium (Balanced)")
             
-        st.caption(f"🎞️ Generating **{num_frames} frames** (~{real_duration:.1f}s)")
-        
-        num_steps = st.slider("Quality Steps", 15, 50, 30)
-        guidance = st.slider("Prompt Strength", 1.0, 15.0, 7.5, 0.5)
-        
-        st.markdown("---")
-        
-        # Video Style & Quality
-        st.markdown("#### 🎨 Video Style & Quality")
-        
-        video_style = st.selectbox(
-            "Video Style",
-            ["🎬 Cinematic", "🎨 Anime", "📹 Normal"],
-            index=0,
-            help="Visual style to apply to your video"
-        )
-        
-        # Extract style name
-        style_name = video_style.split(" ")[1] if " " in video_style else video_style
-        
-        # Quality presets with resolution
-        quality_presets = {
-            "Normal": {"width": 256, "height": 256, "steps_boost": 0, "desc": "Fast preview", "vram": "4GB"},
-            "Medium": {"width": 384, "height": 384, "steps_boost": 5, "desc": "Balanced", "vram": "6GB"},
-            "Standard": {"width": 512, "height": 512, "steps_boost": 10, "desc": "Good quality", "vram": "8GB"},
-            "HD 720p": {"width": 1280, "height": 720, "steps_boost": 15, "desc": "HD quality", "vram": "12GB"},
-            "Full HD 1080p": {"width": 1920, "height": 1080, "steps_boost": 20, "desc": "Full HD", "vram": "16GB"},
-            "QHD 1440p": {"width": 2560, "height": 1440, "steps_boost": 25, "desc": "Ultra HD", "vram": "24GB+"},
-        }
-        
-        # HD options that require warning on local mode
-        high_vram_options = ["HD 720p", "Full HD 1080p", "QHD 1440p"]
-        
-        # For cloud mode, show all options
-        if mode == "Cloud (Faster)":
-            quality = st.selectbox(
-                "Quality Preset",
-                list(quality_presets.keys()),
-                index=4,  # Default to 1080p for cloud
-                format_func=lambda x: f"{x} ({quality_presets[x]['width']}x{quality_presets[x]['height']})",
-                help="☁️ Cloud supports all resolutions!"
+            # Filled in once every input is known (see _derive_dims below)
+            size_slot = st.empty()
+            
+            st.markdown("---")
+            
+            # Duration & FPS
+            st.markdown("#### ⏱️ Duration & Motion")
+            
+            target_duration = st.select_slider(
+                "Video Length (Seconds)", 
+                options=[2, 3, 4, 5, 8], 
+                value=4,
+                help="Longer videos require more memory and time."
             )
-            selected_preset = quality_presets[quality]
-            st.success(f"☁️ Cloud: {quality} - {selected_preset['desc']}")
-        else:
-            # Local mode - show warning for high resolution
-            quality = st.selectbox(
-                "Quality Preset",
-                list(quality_presets.keys()),
-                index=2,  # Default to Standard for local
-                format_func=lambda x: f"{x} ({quality_presets[x]['width']}x{quality_presets[x]['height']})",
-                help="Higher quality requires more VRAM"
+            
+            fps = st.slider("FPS (Smoothness)", 8, 24, 8) # Increased max FPS to 24 for smoother video
+            
+            frames_slot = st.container()
+            
+            num_steps = st.slider("Quality Steps", 15, 50, 30)
+            guidance = st.slider("Prompt Strength", 1.0, 15.0, 7.5, 0.5)
+            
+            st.markdown("---")
+            
+            # Video Style & Quality
+            st.markdown("#### 🎨 Video Style & Quality")
+            
+            video_style = st.selectbox(
+                "Video Style",
+                ["🎬 Cinematic", "🎨 Anime", "📹 Normal"],
+                index=0,
+                help="Visual style to apply to your video"
             )
-            selected_preset = quality_presets[quality]
             
-            # Show crash warning for HD options on local
-            if quality in high_vram_options:
-                st.error(f"""
-                ⚠️ **SYSTEM CRASH WARNING**
-                
-                **{quality}** requires **{selected_preset['vram']} VRAM**.
-                
-                Running this locally may cause:
-                - 💥 Application crash
-                - 🖥️ System freeze
-                - ❌ Out of memory error
-                
-                **Recommendation:** Use **☁️ Cloud Mode** for HD/4K quality!
-                """)
-        
-        # Apply quality preset to dimensions
-        width = selected_preset["width"]
-        height = selected_preset["height"]
-        # Boost steps for higher quality
-        num_steps = min(50, num_steps + selected_preset["steps_boost"])
-        
-        st.caption(f"🎯 Style: **{style_name}** | Resolution: **{width}x{height}** | Steps: **{num_steps}**")
-        
-        st.markdown("---")
-        
-        # Subtitle & Refinement
-        st.markdown("#### 📝 Options")
-        enable_subtitles = st.checkbox("🎯 Add Subtitles", value=True, help="Auto-generate subtitles on video")
-        enable_refinement = st.checkbox("✨ Smart Prompt", value=False, help="Use AI to improve prompt")
-        low_vram_mode = st.checkbox("🐢 Low VRAM Mode", value=True, help="Prevents crashing on 8GB GPUs")
-        
-        st.markdown("---")
-        
-        # Status Board
-        st.markdown("#### ℹ️ Video Info")
+            # Extract style name
+            style_name = video_style.split(" ")[1] if " " in video_style else video_style
+            
+            # For cloud mode, show all options
+            if mode == "Cloud (Faster)":
+                quality = st.selectbox(
+                    "Quality Preset",
+                    tuple(_QUALITY_PRESETS),
+                    index=4,  # Default to 1080p for cloud
+                    format_func=lambda x: f"{x} ({_QUALITY_PRESETS[x]['width']}x{_QUALITY_PRESETS[x]['height']})",
+                    help="☁️ Cloud supports all resolutions!"
+                )
+                selected_preset = _QUALITY_PRESETS[quality]
+                st.success(f"☁️ Cloud: {quality} - {selected_preset['desc']}")
+            else:
+                # Local mode - show warning for high resolution
+                quality = st.selectbox(
+                    "Quality Preset",
+                    tuple(_QUALITY_PRESETS),
+                    index=2,  # Default to Standard for local
+                    format_func=lambda x: f"{x} ({_QUALITY_PRESETS[x]['width']}x{_QUALITY_PRESETS[x]['height']})",
+                    help="Higher quality requires more VRAM"
+                )
+                selected_preset = _QUALITY_PRESETS[quality]
+            
+                # Show crash warning for HD options on local
+                if quality in _HIGH_VRAM_OPTIONS:
+                    st.error(f"""
+                    ⚠️ **SYSTEM CRASH WARNING**
+            
+                    **{quality}** requires **{selected_preset['vram']} VRAM**.
+            
+                    Running this locally may cause:
+                    - 💥 Application crash
+                    - 🖥️ System freeze
+                    - ❌ Out of memory error
+            
+                    **Recommendation:** Use **☁️ Cloud Mode** for HD/4K quality!
+                    """)
+            
+            dims = _derive_dims(aspect_ratio, quality_setting, target_duration, fps, quality, num_steps)
+            width, height = dims["width"], dims["height"]
+            num_frames, real_duration = dims["num_frames"], dims["real_duration"]
+            num_steps = dims["num_steps"]
+            
+            size_slot.caption(f"📏 Output Size: **{dims['ar_width']}x{dims['ar_height']}**")
+            with frames_slot:
+                if dims["frames_capped"]:
+                    st.warning(f"⚠️ Limit: {_MAX_SAFE_FRAMES} frames (approx {_MAX_SAFE_FRAMES/fps:.1f}s at {fps} FPS) to prevent crashing.")
+                st.caption(f"🎞️ Generating **{num_frames} frames** (~{real_duration:.1f}s)")
+            
+            st.caption(f"🎯 Style: **{style_name}** | Resolution: **{width}x{height}** | Steps: **{num_steps}**")
+            
+            st.markdown("---")
+            
+            # Subtitle & Refinement
+            st.markdown("#### 📝 Options")
+            enable_subtitles = st.checkbox("🎯 Add Subtitles", value=True, help="Auto-generate subtitles on video")
+            enable_refinement = st.checkbox("✨ Smart Prompt", value=False, help="Use AI to improve prompt")
+            low_vram_mode = st.checkbox("🐢 Low VRAM Mode", value=True, help="Prevents crashing on 8GB GPUs")
+            
+            st.form_submit_button("✅ Apply Settings", use_container_width=True)
         
-        st.markdown(f"""
+        # Everything below is derived from the widget values; reuse last
+        # rerun's settings dict and status board when none of them changed
+        sidebar_key = (mode, model_info["id"] if mode == "Local (Offline)" else None, quality_setting,
+                       quality, style_name, width, height, num_frames, real_duration, num_steps,
+                       guidance, fps, enable_subtitles, enable_refinement, low_vram_mode)
+        if st.session_state.get("_last_sidebar_key") == sidebar_key:
+            settings = st.session_state._last_sidebar_settings
+            board_html = st.session_state._last_sidebar_board
+        else:
+            settings = {
+                "model": "modelscope" if mode == "Local (Offline)" else "cloud_v2",
+                "model_id": model_info["id"] if mode == "Local (Offline)" else None,
+                "quality": quality_setting,
+                "quality_setting": quality_setting,
+                "quality_preset": quality,  # Normal/Medium/Standard/Pro
+                "video_style": style_name,  # Cinematic/Anime/Normal
+                "width": width,
+                "height": height,
+                "num_frames": num_frames,
+                "num_steps": num_steps,
+                "guidance": guidance,
+                "fps": fps,
+                "enable_subtitles": enable_subtitles,
+                "enable_refinement": enable_refinement,
+                "low_vram": low_vram_mode,
+                "mode": mode,
+            }
+            board_html = f"""
         <div style="font-size: 0.85rem; color: #94a3b8; background: rgba(255,255,255,0.05); padding: 10px; border-radius: 8px;">
             <div>📏 <strong>Resolution:</strong> {width}x{height}</div>
             <div>⏱️ <strong>Length:</strong> {real_duration:.1f}s</div>
@@ -602,69 +851,205 @@ def render_sidebar():
                 <div>📝 <strong>Subtitles:</strong> {"Enabled" if enable_subtitles else "Disabled"}</div>
             </div>
         </div>
-        """, unsafe_allow_html=True)
+        """
+            st.session_state._last_sidebar_key = sidebar_key
+            st.session_state._last_sidebar_settings = settings
+            st.session_state._last_sidebar_board = board_html
+        
+        st.markdown("---")
+        
+        # Status Board
+        st.markdown("#### ℹ️ Video Info")
+        
+        st.html(board_html)
         
         st.markdown("---")
         
         # Device info
-        try:
-            import torch
-            device = "🟢 CUDA (GPU)" if torch.cuda.is_available() else "🟡 CPU (Slow)"
-        except ImportError:
-            device = "☁️ Cloud Mode (No local GPU)"
-        st.markdown(f"**Device:** {device}")
+        st.markdown(f"**Device:** {_DEVICE_LABEL}")
         
         # Cloud Status - Load persistence
-        if not st.session_state.get("cloud_job_id"):
+        cloud_job_id = st.session_state.get("cloud_job_id")
+        if not cloud_job_id:
              from utils.storage import get_latest_cloud_job
              last_job = get_latest_cloud_job()
              if last_job:
-                 st.session_state.cloud_job_id = last_job["id"]
+                 cloud_job_id = st.session_state.cloud_job_id = last_job["id"]
 
         # Cloud Status Widget
-        if st.session_state.get("cloud_job_id"):
+        if cloud_job_id:
             st.markdown("---")
             st.markdown("#### ☁️ Cloud Status")
-            st.caption(f"Job: {st.session_state.cloud_job_id}")
+            st.caption(f"Job: {cloud_job_id}")
             
-            if st.button("🔄 Check Now"):
-                with st.spinner("Checking cloud..."):
-                    from utils.firebase_utils import get_job_status
-                    data = get_job_status(st.session_state.cloud_job_id)
-                    if data:
-                        st.session_state.cloud_status = data
-                    else:
-                        st.error("Failed to fetch status")
-            
-            status = st.session_state.get("cloud_status", {}).get("status", "pending")
+            cloud_status = st.session_state.get("cloud_status", {})
+            status = cloud_status.get("status", "pending")
+            interval = _CLOUD_POLL_INTERVALS.get(status)
+            if interval:
+                # Re-runs just the poller on a timer; the page reruns on a state change
+                _fragment(run_every=interval)(_poll_cloud_job)(interval)
             st.markdown(f"**State:** `{status}`")
             
             if status == "completed":
-                url = st.session_state.cloud_status.get("video_url")
+                url = cloud_status.get("video_url")
                 if url:
                     st.success("✨ Video Ready!")
-                    st.video(url)
+                    st.video(_video_bytes(url))
             elif status == "error":
-                st.error(st.session_state.cloud_status.get("error", "Unknown Error"))
+                st.error(cloud_status.get("error", "Unknown Error"))
                 
-        return {
-            "model": "modelscope" if mode == "Local (Offline)" else "cloud_v2",
-            "model_id": model_info["id"] if mode == "Local (Offline)" else None,
-            "quality": quality_setting,
-            "quality_setting": quality_setting,
-            "quality_preset": quality,  # Normal/Medium/Standard/Pro
-            "video_style": style_name,  # Cinematic/Anime/Normal
-            "width": width,
-            "height": height,
-            "num_frames": num_frames,
-            "num_steps": num_steps,
-            "guidance": guidance,
-            "fps": fps,
-            "enable_subtitles": enable_subtitles,
-            "enable_refinement": enable_refinement,
-            "low_vram": low_vram_mode,
-            "mode": mode,
-        }
+        # Copy: the prompt section may adjust fps/frames/steps per generation
+        return dict(settings)
+
+
+# Auto-poll period (seconds) per cloud job state; finished jobs are not polled
+_CLOUD_POLL_INTERVALS = MappingProxyType({
+    "pending": 15,
+    "processing": 2,
+})
+
+# st.fragment is stable from Streamlit 1.37; 1.33-1.36 ship it as experimental
+_fragment = getattr(st, "fragment", None) or st.experimental_fragment
+
+
+def _poll_cloud_job(interval: int):
+    """
+    Fetch the cloud job's status fields if at least `interval` seconds passed.
+    
+    Unchanged documents come back as a no-op marker, so nothing is written;
+    a status transition triggers a full rerun to refresh the sidebar.
+    """
+    now = time.monotonic()
+    if now - st.session_state.get("cloud_polled_at", 0.0) < interval:
+        return
+    st.session_state.cloud_polled_at = now
+    
+    from utils.firebase_utils import get_job_status
+    previous = st.session_state.get("cloud_status", {})
+    data = get_job_status(st.session_state.cloud_job_id, since=previous.get("update_time"))
+    if not data or data.get("unchanged"):
+        return
+    
+    st.session_state.cloud_status = data
+    if data.get("status") != previous.get("status"):
+        if data.get("status") == "completed" and data.get("video_url"):
+            # Warm the cache so the rerun renders the player without a fetch
+            _video_bytes(data["video_url"])
+        st.rerun()
+
+
+@st.cache_data(ttl=60, show_spinner=False, max_entries=8)
+def _video_bytes(url: str) -> bytes:
+    """
+    Get a finished cloud video's bytes, fetched at most once a minute.
+    
+    The worker reports a local path when it shares the disk with the app,
+    otherwise an HTTP(S) URL.
+    """
+    if url.startswith(("http://", "https://")):
+        import requests
+        resp = requests.get(url, timeout=60)
+        resp.raise_for_status()
+        return resp.content
+    with open(url, "rb") as f:
+        return f.read()
+
+
+_STATUS_ERROR_STYLE = ' style="background: rgba(239, 68, 68, 0.2); color: #ef4444;"'
+
+
+def show_status(status_placeholder, text: str, state: str = "generating"):
+    """
+    Render a status badge into a placeholder as one raw-HTML fragment.
+    
+    Args:
+        status_placeholder: st.empty() slot to overwrite
+        text: Badge text (emoji included)
+        state: "generating", "ready" or "error"
+    """
+    if state == "error":
+        badge = f'<span class="status-badge"{_STATUS_ERROR_STYLE}>{html.escape(text)}</span>'
+    else:
+        badge = f'<span class="status-badge status-{state}">{html.escape(text)}</span>'
+    status_placeholder.html(badge)
+
+
+def _frames_to_uint8(frames, normalized: bool = None):
+    """Stack frames into one (N, H, W, C) uint8 array, converting dtype once."""
+    if isinstance(frames, np.ndarray):
+        # Pipeline output is already one (N, H, W, C) array; don't copy it
+        arr, owned = frames, False
+    else:
+        arr, owned = np.stack([f.numpy() if hasattr(f, 'numpy') else np.asarray(f) for f in frames]), True
+    
+    # Handle float frames (0-1 or 0-255 range) in one buffer; a float32
+    # stack we own doubles as the scratch space
+    from utils.video import to_uint8
+    scratch = arr if owned and arr.dtype == np.float32 else None
+    arr = to_uint8(arr, normalized, scratch)
+    
+    # Grayscale clips keep a single channel (a free view); the encoder
+    # takes them as gray input instead of a tripled RGB copy
+    if arr.ndim == 3:
+        arr = arr[..., None]
+    return arr
+
+
+def iter_upscaled_frames(frames, target_w: int, target_h: int, batch_size: int = 16,
+                         normalized: bool = None):
+    """
+    Yield frames resized to target_w x target_h, one (H, W, C) uint8 array at a time.
+    
+    With torch available the clip is resized with batched bicubic
+    interpolation, batch_size frames per call, on the GPU when CUDA is
+    available; otherwise it falls back to per-frame PIL Lanczos. A
+    (N, C, H, W) [0, 1] tensor (e.g. from generate(as_tensor=True)) is
+    resized on its own device. Only one batch of output is alive at a time,
+    so the frames can be streamed straight into the encoder.
+    """
+    if _TORCH_AVAILABLE and torch.is_tensor(frames):
+        for batch in _resize_batches(frames, target_w, target_h, 255.0, batch_size):
+            yield from batch.cpu().numpy()
+        return
+    
+    arr = _frames_to_uint8(frames, normalized)
+    
+    if not _TORCH_AVAILABLE:
+        # Wrap each contiguous frame without copying; Pillow-SIMD, if
+        # installed in place of Pillow, vectorizes the Lanczos resample
+        arr = np.ascontiguousarray(arr)
+        mode = {1: "L", 3: "RGB", 4: "RGBA"}[arr.shape[-1]]
+        size = (arr.shape[2], arr.shape[1])
+        for frame in arr:
+            img = PIL.Image.frombuffer(mode, size, frame, "raw", mode, 0, 1)
+            yield np.asarray(img.resize((target_w, target_h), PIL.Image.LANCZOS))
+        return
+    
+    video = torch.from_numpy(arr).permute(0, 3, 1, 2)
+    if _CUDA_OK:
+        # uint8 upload; the filter runs on the GPU, one download per batch
+        video = video.to("cuda", non_blocking=True)
+    for batch in _resize_batches(video, target_w, target_h, 1.0, batch_size):
+        yield from batch.cpu().numpy()
+
+
+def _resize_batches(video, target_w: int, target_h: int, scale: float, batch_size: int):
+    """
+    Batched bicubic resize of an (N, C, H, W) tensor on its own device.
+    
+    Pixel values are multiplied by `scale` to reach the 0-255 range. Yields
+    (batch, target_h, target_w, C) uint8 tensors, without the channel axis
+    for single-channel input.
+    """
+    import torch.nn.functional as F
+    for start in range(0, video.shape[0], batch_size):
+        batch = video[start:start + batch_size].float()
+        if scale != 1.0:
+            batch.mul_(scale)
+        batch = F.interpolate(batch, size=(target_h, target_w), mode="bicubic",
+                              align_corners=False, antialias=True)
+        batch = batch.clamp_(0, 255).round_().permute(0, 2, 3, 1).to(torch.uint8)
+        yield batch[..., 0] if batch.shape[-1] == 1 else batch
 
 
 def generate_video(prompt: str, settings: dict, status_placeholder):
@@ -672,31 +1057,34 @@ def generate_video(prompt: str, settings: dict, status_placeholder):
     
     # ----------------CLOUD MODE (HuggingFace Inference API)----------------
     if settings.get("mode") == "Cloud (Faster)":
-        status_placeholder.markdown('<span class="status-badge status-generating">☁️ Connecting to HuggingFace Cloud...</span>', unsafe_allow_html=True)
+        show_status(status_placeholder, "☁️ Connecting to HuggingFace Cloud...")
         
         try:
-            from utils.hf_inference import generate_video_hf
+            generate_video_hf = _get_hf_generate()
             
             def hf_progress(msg):
-                status_placeholder.markdown(f'<span class="status-badge status-generating">☁️ {msg}</span>', unsafe_allow_html=True)
+                show_status(status_placeholder, f"☁️ {msg}")
             
             # Generate video using HuggingFace API (runs on their servers 24/7!)
+            # A regenerate asks for a new video, so it skips the result cache
             video_path = generate_video_hf(
                 prompt=prompt,
                 settings=settings,
-                progress_callback=hf_progress
+                progress_callback=hf_progress,
+                use_cache=not st.session_state.get("regenerate_count")
             )
             
             if video_path and os.path.exists(video_path):
-                status_placeholder.markdown('<span class="status-badge status-ready">✅ Cloud Video Complete!</span>', unsafe_allow_html=True)
+                show_status(status_placeholder, "✅ Cloud Video Complete!", "ready")
                 
                 # Save to history
                 from utils.storage import save_to_history
                 save_to_history(prompt, "huggingface_cloud", video_path, settings)
+                _cached_history.clear()
                 
                 return video_path
             else:
-                status_placeholder.markdown('<span class="status-badge" style="background: rgba(239, 68, 68, 0.2); color: #ef4444;">❌ Cloud generation failed</span>', unsafe_allow_html=True)
+                show_status(status_placeholder, "❌ Cloud generation failed", "error")
                 st.error("Cloud generation failed. The HuggingFace API may be busy or the model is loading.")
                 st.info("💡 **Tip:** HuggingFace models may take 2-5 minutes to 'warm up' on first use. Try again in a few minutes!")
                 return None
@@ -714,17 +1102,24 @@ def generate_video(prompt: str, settings: dict, status_placeholder):
         # Get selected model name for display
         model_id = settings.get("model_id", "damo-vilab/text-to-video-ms-1.7b")
         model_name = model_id.split("/")[-1] if model_id else "text-to-video-ms-1.7b"
-        status_placeholder.markdown(f'<span class="status-badge status-generating">⏳ Loading {model_name}...</span>', unsafe_allow_html=True)
+        show_status(status_placeholder, f"⏳ Loading {model_name}...")
         
-        from models.modelscope import get_modelscope_generator
-        generator = get_modelscope_generator()
+        generator = _get_modelscope()
         
         # Set the user-selected model
         if model_id:
             generator.set_model(model_id)
         
         def progress_callback(msg):
-            status_placeholder.markdown(f'<span class="status-badge status-generating">⏳ {msg}</span>', unsafe_allow_html=True)
+            show_status(status_placeholder, f"⏳ {msg}")
+        
+        # Resize frames to target resolution (Upscaling)
+        target_w = settings.get("width", 256)
+        target_h = settings.get("height", 256)
+        # Only resize if meaningful difference to avoid blur on correct sizes
+        needs_upscale = abs(target_w - 256) > 16 or abs(target_h - 256) > 16
+        # Keep frames on the GPU for the upscale when VRAM allows
+        upscale_on_gpu = needs_upscale and _CUDA_OK and not settings.get("low_vram", True)
         
         frames = generator.generate(
             prompt=prompt,
@@ -735,61 +1130,34 @@ def generate_video(prompt: str, settings: dict, status_placeholder):
             width=min(settings.get("width", 512), 512),    # ModelScope max 512
             low_vram=settings.get("low_vram", True),
             enhance_prompt=True,  # Auto-enhance for quality
+            as_tensor=upscale_on_gpu,
+            vae_tiling=True,
             progress_callback=progress_callback
         )
 
-        # Resize frames to target resolution (Upscaling)
-        target_w = settings.get("width", 256)
-        target_h = settings.get("height", 256)
-        # Only resize if meaningful difference to avoid blur on correct sizes
-        if abs(target_w - 256) > 16 or abs(target_h - 256) > 16:
-            status_placeholder.markdown(f'<span class="status-badge status-generating">🔍 Upscaling to {target_w}x{target_h}...</span>', unsafe_allow_html=True)
-            import PIL.Image
-            import numpy as np
-            resized_frames = []
-            for f in frames:
-                # Convert to numpy array if needed
-                if hasattr(f, 'numpy'):
-                    f = f.numpy()
-                elif not isinstance(f, np.ndarray):
-                    f = np.array(f)
-                
-                # Handle float32 frames (0-1 or 0-255 range)
-                if f.dtype in [np.float32, np.float64]:
-                    if f.max() <= 1.0:
-                        f = (f * 255).astype(np.uint8)
-                    else:
-                        f = f.clip(0, 255).astype(np.uint8)
-                elif f.dtype != np.uint8:
-                    f = f.astype(np.uint8)
-                
-                # Ensure 3D array (H, W, C)
-                if f.ndim == 2:
-                    f = np.stack([f, f, f], axis=-1)
-                
-                # Convert numpy -> PIL -> Resize -> numpy
-                img = PIL.Image.fromarray(f)
-                img = img.resize((target_w, target_h), PIL.Image.LANCZOS)
-                resized_frames.append(np.array(img))
-            frames = resized_frames
-
+        source_frames = frames
+        
+        def frame_stream():
+            """Frames at the output size, resized lazily while they are encoded."""
+            if needs_upscale:
+                # Diffusers returns float frames in [0, 1]
+                return iter_upscaled_frames(source_frames, target_w, target_h, normalized=True)
+            return iter(source_frames)
+        
         # Add AI-generated subtitles
+        subtitles = None
         if settings.get("enable_subtitles"):
-            status_placeholder.markdown('<span class="status-badge status-generating">⏳ Generating subtitles...</span>', unsafe_allow_html=True)
-            from models.subtitle_generator import generate_video_subtitles
-            from utils.subtitles import add_subtitles_to_frames
+            show_status(status_placeholder, "⏳ Generating subtitles...")
             
             # Generate contextual subtitles
             duration = settings["num_frames"] / settings["fps"]
             try:
-                subtitles = generate_video_subtitles(
-                    prompt=prompt,
-                    duration_seconds=duration,
-                    progress_callback=lambda msg: status_placeholder.markdown(f'<span class="status-badge status-generating">⏳ {msg}</span>', unsafe_allow_html=True)
-                )
-                
-                # Apply subtitles to frames
-                frames = add_subtitles_to_frames(frames, subtitles, settings["fps"])
+                if st.session_state.get("regenerate_count"):
+                    # Subtitles are sampled; a regenerate draws new ones
+                    from models.subtitle_generator import generate_video_subtitles
+                    subtitles = generate_video_subtitles(prompt=prompt, duration_seconds=duration)
+                else:
+                    subtitles = _memo(_cached_subtitles, prompt, duration)
             except Exception as sub_e:
                 print(f"Subtitle Error: {sub_e}")
                 st.warning(f"Subtitle generation failed, creating video without subtitles. Error: {sub_e}")
@@ -799,17 +1167,39 @@ def generate_video(prompt: str, settings: dict, status_placeholder):
         output_dir = ensure_output_dir()
         filename = generate_filename()
         output_path = str(output_dir / filename)
-        save_video_from_frames(frames, output_path, fps=settings["fps"])
+        
+        if needs_upscale:
+            show_status(status_placeholder, f"🔍 Upscaling to {target_w}x{target_h}...")
+        
+        if subtitles:
+            # Encode once, then let ffmpeg/libass burn the subtitles in
+            raw_path = str(output_dir / f"raw_{filename}")
+            save_video_from_frames(frame_stream(), raw_path, fps=settings["fps"], normalized=True)
+            try:
+                from utils.audio import process_video_with_subtitles
+                process_video_with_subtitles(raw_path, subtitles, output_path)
+            except Exception as burn_e:
+                # ffmpeg build without libass: draw the subtitles per frame
+                print(f"Subtitle burn failed ({burn_e}), overlaying frames instead")
+                from utils.subtitles import add_subtitles_to_frames
+                frames = add_subtitles_to_frames(frame_stream(), subtitles, settings["fps"])
+                save_video_from_frames(frames, output_path, fps=settings["fps"])
+            finally:
+                if os.path.exists(raw_path):
+                    os.remove(raw_path)
+        else:
+            save_video_from_frames(frame_stream(), output_path, fps=settings["fps"], normalized=True)
         
         # Save to history
         from utils.storage import save_to_history
         save_to_history(prompt, "modelscope", output_path, settings)
+        _cached_history.clear()
         
-        status_placeholder.markdown('<span class="status-badge status-ready">✅ Complete!</span>', unsafe_allow_html=True)
+        show_status(status_placeholder, "✅ Complete!", "ready")
         return output_path
         
     except Exception as e:
-        status_placeholder.markdown(f'<span class="status-badge" style="background: rgba(239, 68, 68, 0.2); color: #ef4444;">❌ {str(e)}</span>', unsafe_allow_html=True)
+        show_status(status_placeholder, f"❌ {e}", "error")
         st.error(f"Error: {str(e)}")
         return None
 
@@ -899,13 +1289,7 @@ def render_prompt_section(settings):
         # Step 1: Multi-language Translation (TranslateGemma)
         try:
             status_placeholder.markdown('<span class="status-badge status-generating">🌐 Detecting language...</span>', unsafe_allow_html=True)
-            from models.translator import get_translator
-            translator = get_translator()
-            
-            translation_result = translator.translate_to_english(
-                prompt,
-                progress_callback=lambda msg: status_placeholder.markdown(f'<span class="status-badge status-generating">🌐 {msg}</span>', unsafe_allow_html=True)
-            )
+            translation_result = _memo(_cached_translation, prompt)
             
             detected_lang = translation_result.get("detected_language", "en")
             if translation_result.get("was_translated"):
@@ -923,21 +1307,8 @@ def render_prompt_section(settings):
         if settings.get("enable_refinement"):
             try:
                 status_placeholder.markdown('<span class="status-badge status-generating">🧠 Analyzing with LLAMA 4 Scout...</span>', unsafe_allow_html=True)
-                from models.llama_prompt_generator import get_llama_generator
-                llama_gen = get_llama_generator()
-                
-                # Analyze prompt
-                analysis_data = llama_gen.analyze_prompt(
-                    prompt,
-                    progress_callback=lambda msg: status_placeholder.markdown(f'<span class="status-badge status-generating">🧠 {msg}</span>', unsafe_allow_html=True)
-                )
-                
-                # Generate enhanced video prompt
-                enhanced_config = llama_gen.generate_video_prompt(
-                    analysis_data,
-                    prompt,
-                    progress_callback=lambda msg: status_placeholder.markdown(f'<span class="status-badge status-generating">🧠 {msg}</span>', unsafe_allow_html=True)
-                )
+                # Analyze prompt and generate enhanced video prompt
+                analysis_data, enhanced_config = _memo(_cached_llama_refinement, prompt)
                 
                 # Apply LLAMA-generated settings
                 if enhanced_config.get("prompt"):
@@ -974,10 +1345,12 @@ def render_prompt_section(settings):
                     prompt = refined_data.get("prompt", prompt)
                     settings["num_steps"] = refined_data.get("num_inference_steps", settings["num_steps"])
         
-        # Step 3: Save to Search History
+        # Step 3: Save to Search History (written in the background)
         try:
             from utils.search_history import save_search
-            save_search(
+            _save_in_background(
+                save_search,
+                "Search history",
                 prompt=original_prompt,
                 language_detected=detected_lang,
                 translated_prompt=translated_prompt,
@@ -995,18 +1368,19 @@ def render_prompt_section(settings):
             st.session_state.generated_video = video_path
             
             # Save to JSON history
-            from utils.storage import load_history
-            st.session_state.history = load_history()
+            st.session_state.history = _cached_history()
             
-            # Step 5: Save to CSV Storage
+            # Step 5: Save to CSV Storage (written in the background)
             try:
                 from utils.csv_storage import save_video_to_csv
                 source = "cloud" if settings.get("mode") == "Cloud (Faster)" else "local"
-                save_video_to_csv(
+                _save_in_background(
+                    save_video_to_csv,
+                    "CSV storage",
                     prompt=original_prompt,
                     model=settings.get("model", "unknown"),
                     video_path=video_path,
-                    settings=settings,
+                    settings=dict(settings),
                     source=source
                 )
             except Exception as e:
@@ -1025,21 +1399,21 @@ def render_video_player():
         st.markdown('<div class="glass-card">', unsafe_allow_html=True)
         st.markdown("#### 🎥 Generated Video")
         
-        video_file = open(st.session_state.generated_video, "rb")
-        video_bytes = video_file.read()
-        st.video(video_bytes)
+        # Let Streamlit load the file itself instead of holding our own copy
+        st.video(st.session_state.generated_video)
         
         # Action buttons row
         col1, col2, col3 = st.columns([1, 1, 1])
         
         with col1:
-            st.download_button(
-                label="⬇️ Download",
-                data=video_bytes,
-                file_name=os.path.basename(st.session_state.generated_video),
-                mime="video/mp4",
-                use_container_width=True
-            )
+            with open(st.session_state.generated_video, "rb") as video_file:
+                st.download_button(
+                    label="⬇️ Download",
+                    data=video_file,
+                    file_name=os.path.basename(st.session_state.generated_video),
+                    mime="video/mp4",
+                    use_container_width=True
+                )
         
         with col2:
             # Regenerate button - only show if under max attempts
@@ -1083,15 +1457,35 @@ def render_video_player():
         st.markdown('</div>', unsafe_allow_html=True)
 
 
+@st.cache_data(max_entries=1, show_spinner=False)
+def _list_cloud_videos(cloud_dir: str, dir_mtime: float) -> list:
+    """
+    List mp4 files in cloud_dir, newest first.
+    
+    Keyed on the directory's mtime, which changes whenever a video is
+    added or removed, so reruns reuse the sorted list until then.
+    
+    Returns:
+        List of (file name, path) tuples
+    """
+    # scandir entries carry their stat results, one syscall per file
+    with os.scandir(cloud_dir) as it:
+        entries = [e for e in it if e.name.endswith('.mp4')]
+    entries.sort(key=lambda e: e.stat().st_mtime, reverse=True)
+    return [(e.name, e.path) for e in entries]
+
+
 def render_cloud_videos():
     """Render cloud-generated videos from cloud_outputs folder."""
     cloud_dir = "cloud_outputs"
     
-    if not os.path.exists(cloud_dir):
+    try:
+        dir_mtime = os.stat(cloud_dir).st_mtime
+    except OSError:
         return
     
-    # Get all mp4 files in cloud_outputs
-    cloud_videos = [f for f in os.listdir(cloud_dir) if f.endswith('.mp4')]
+    # Get all mp4 files in cloud_outputs, sorted by modification time
+    cloud_videos = _list_cloud_videos(cloud_dir, dir_mtime)
     
     if not cloud_videos:
         return
@@ -1099,15 +1493,10 @@ def render_cloud_videos():
     st.markdown("---")
     st.markdown("### ☁️ Cloud Generated Videos")
     
-    # Sort by modification time (newest first)
-    cloud_videos.sort(key=lambda x: os.path.getmtime(os.path.join(cloud_dir, x)), reverse=True)
-    
     # Display in grid
     cols = st.columns(min(len(cloud_videos), 4))
     
-    for i, video_file in enumerate(cloud_videos[:8]):  # Show max 8
-        video_path = os.path.join(cloud_dir, video_file)
-        
+    for i, (video_file, video_path) in enumerate(cloud_videos[:8]):  # Show max 8
         with cols[i % 4]:
             # Show video ID (truncated)
             video_id = video_file.replace('.mp4', '')[:8]
@@ -1127,7 +1516,7 @@ def render_cloud_videos():
             with open(video_path, "rb") as f:
                 st.download_button(
                     "⬇️",
-                    data=f.read(),
+                    data=f,
                     file_name=video_file,
                     mime="video/mp4",
                     key=f"cloud_dl_{video_id}",
@@ -1135,6 +1524,81 @@ def render_cloud_videos():
                 )
 
 
+_MODEL_ICONS = MappingProxyType({
+    "veo": "🌟",
+    "modelscope": "🎬",
+    "cogvideox": "🎥"
+})
+
+
+@st.cache_data(show_spinner=False, max_entries=200)
+def _thumb_b64(path: str, mtime: float) -> str:
+    """
+    Get the base64 PNG thumbnail of a video's first frame.
+    
+    Keyed on (path, mtime) so a rewritten file gets a fresh thumbnail while
+    unchanged ones are decoded only once.
+    """
+    from utils.video import get_video_thumbnail
+    return base64.b64encode(get_video_thumbnail(path)).decode("ascii")
+
+
+def _video_mtimes(paths) -> dict:
+    """
+    Find which of `paths` exist with one os.scandir per containing folder.
+    
+    Only the matching entries are stat'ed, for their mtime.
+    
+    Returns:
+        Dict of normalized path -> mtime for the files that exist
+    """
+    wanted = {os.path.normpath(p) for p in paths if p}
+    mtimes = {}
+    for folder in {os.path.dirname(p) for p in wanted}:
+        try:
+            with os.scandir(folder or ".") as it:
+                for e in it:
+                    path = os.path.normpath(e.path)
+                    if path in wanted and e.is_file():
+                        mtimes[path] = e.stat().st_mtime
+        except OSError:
+            continue
+    return mtimes
+
+
+def _history_card(entry: dict, mtime: float = None) -> str:
+    """Build the HTML for one history grid card (mtime is None if the video is gone)."""
+    model_icon = _MODEL_ICONS.get(entry.get('model', ''), "📹")
+    
+    # Thumbnail when the video is still on disk, model icon otherwise
+    icon_html = f'<div class="icon">{model_icon}</div>'
+    video_path = entry.get('video_path', '')
+    try:
+        if mtime is not None:
+            thumb = _thumb_b64(video_path, mtime)
+            icon_html = (f'<img loading="lazy" src="data:image/png;base64,{thumb}" alt="{model_icon}" '
+                         f'style="width: 100%; border-radius: 8px;">')
+    except Exception:
+        pass
+    
+    # Create timestamp
+    created = entry.get('created_at', '')
+    if created:
+        try:
+            dt = datetime.fromisoformat(created)
+            time_str = dt.strftime("%H:%M")
+        except:
+            time_str = "..."
+    else:
+        time_str = "..."
+    
+    return f'''
+    <div class="history-icon">
+        {icon_html}
+        <div class="label">{time_str}</div>
+    </div>'''
+
+
 def render_history_icons():
     """Render history as icon grid - always visible."""
     st.markdown("---")
@@ -1161,36 +1625,18 @@ def render_history_icons():
         </div>
         """, unsafe_allow_html=True)
     else:
-        # Icon grid
-        cols = st.columns(min(len(history), 6))
+        shown = history[:6]
+        mtimes = _video_mtimes(entry.get('video_path', '') for entry in shown)
+        shown_mtimes = [mtimes.get(os.path.normpath(entry.get('video_path') or '.')) for entry in shown]
         
-        for i, entry in enumerate(history[:6]):
-            with cols[i]:
-                model_icon = {
-                    "veo": "🌟",
-                    "modelscope": "🎬",
-                    "cogvideox": "🎥"
-                }.get(entry.get('model', ''), "📹")
-                
-                # Create timestamp
-                created = entry.get('created_at', '')
-                if created:
-                    try:
-                        dt = datetime.fromisoformat(created)
-                        time_str = dt.strftime("%H:%M")
-                    except:
-                        time_str = "..."
-                else:
-                    time_str = "..."
-                
-                st.markdown(f"""
-                <div class="history-icon">
-                    <div class="icon">{model_icon}</div>
-                    <div class="label">{time_str}</div>
-                </div>
-                """, unsafe_allow_html=True)
-                
-                if os.path.exists(entry.get('video_path', '')):
+        # Icon grid as a single raw-HTML element; columns match the play row below
+        cards = "".join(_history_card(entry, mtime) for entry, mtime in zip(shown, shown_mtimes))
+        st.html(f'<div class="history-grid" style="grid-template-columns: repeat({len(shown)}, 1fr);">{cards}</div>')
+        
+        cols = st.columns(len(shown))
+        for col, entry, mtime in zip(cols, shown, shown_mtimes):
+            if mtime is not None:
+                with col:
                     if st.button("▶️", key=f"play_{entry['id']}", use_container_width=True):
                         st.session_state.generated_video = entry['video_path']
                         st.rerun()
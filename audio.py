@@ -1,10 +1,27 @@
 import os
+import re
+import shutil
 import subprocess
 import imageio_ffmpeg
 
 FFMPEG_EXE = imageio_ffmpeg.get_ffmpeg_exe()
 
 
+def _find_ffprobe():
+    """Locate ffprobe next to the ffmpeg binary or on PATH (None if absent)."""
+    sibling = os.path.join(os.path.dirname(FFMPEG_EXE), "ffprobe.exe" if os.name == "nt" else "ffprobe")
+    if os.path.isfile(sibling):
+        return sibling
+    return shutil.which("ffprobe")
+
+
+# imageio-ffmpeg only bundles ffmpeg, so ffprobe is optional
+FFPROBE_EXE = _find_ffprobe()
+
+# "Duration: HH:MM:SS.ss" line in ffmpeg's input header
+_DUR_RE = re.compile(r"Duration: (\d+):(\d+):(\d+\.?\d*)")
+
+
 def extract_audio(video_path: str, output_path: str = None, format: str = "wav") -> str:
     """
     Extract audio from a video file.
@@ -28,6 +45,7 @@ def extract_audio(video_path: str, output_path: str = None, format: str = "wav")
         "-acodec", "pcm_s16le" if format == "wav" else format,
         "-ar", "16000",  # 16kHz sample rate (good for speech)
         "-ac", "1",  # Mono
+        "-threads", "0",
         "-y",  # Overwrite
         output_path
     ]
@@ -49,6 +67,7 @@ def add_audio_to_video(video_path: str, audio_path: str, output_path: str = None
         "-c:v", "copy",  # Copy video stream
         "-c:a", "aac",   # Encode audio as AAC
         "-shortest",     # End when shortest stream ends
+        "-threads", "0",
         "-y",
         output_path
     ]
@@ -71,6 +90,10 @@ def add_subtitles_to_video(video_path: str, subtitle_path: str, output_path: str
             FFMPEG_EXE,
             "-i", video_path,
             "-vf", f"subtitles='{escaped_path}'",
+            "-c:v", "libx264",
+            "-preset", "ultrafast",
+            "-tune", "fastdecode",
+            "-threads", "0",
             "-c:a", "copy",
             "-y",
             output_path
@@ -105,35 +128,49 @@ def create_srt_file(subtitles: list, output_path: str) -> str:
     """
     def format_time(seconds: float) -> str:
         """Convert seconds to SRT time format (HH:MM:SS,mmm)."""
-        hours = int(seconds // 3600)
-        minutes = int((seconds % 3600) // 60)
-        secs = int(seconds % 60)
-        millis = int((seconds % 1) * 1000)
+        # Integer milliseconds avoid float modulo error (e.g. 2.3 % 1)
+        hours, rem = divmod(round(seconds * 1000), 3_600_000)
+        minutes, rem = divmod(rem, 60_000)
+        secs, millis = divmod(rem, 1000)
         return f"{hours:02d}:{minutes:02d}:{secs:02d},{millis:03d}"
     
-    with open(output_path, "w", encoding="utf-8") as f:
-        for i, sub in enumerate(subtitles, 1):
-            start = format_time(sub["start"])
-            end = format_time(sub["end"])
-            text = sub["text"]
-            f.write(f"{i}\n{start} --> {end}\n{text}\n\n")
+    # Build the whole file in memory and write it once
+    parts = [
+        f"{i}\n{format_time(sub['start'])} --> {format_time(sub['end'])}\n{sub['text']}\n\n"
+        for i, sub in enumerate(subtitles, 1)
+    ]
+    with open(output_path, "w", encoding="utf-8", buffering=1 << 16) as f:
+        f.write("".join(parts))
     
     return output_path
 
 
 def get_video_duration(video_path: str) -> float:
-    """Get duration of a video in seconds."""
+    """Get duration of a video in seconds (from the container header, no decode)."""
+    if FFPROBE_EXE:
+        cmd = [
+            FFPROBE_EXE,
+            "-v", "error",
+            "-show_entries", "format=duration",
+            "-of", "default=nw=1:nk=1",
+            video_path
+        ]
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        try:
+            return float(result.stdout.strip())
+        except ValueError:
+            pass
+    
+    # Without an output ffmpeg only probes the input, prints its header
+    # (including Duration) and exits
     cmd = [
         FFMPEG_EXE,
-        "-i", video_path,
-        "-f", "null",
-        "-"
+        "-i", video_path
     ]
     
     result = subprocess.run(cmd, capture_output=True, text=True)
     # Parse duration from stderr
-    import re
-    match = re.search(r"Duration: (\d+):(\d+):(\d+\.?\d*)", result.stderr)
+    match = _DUR_RE.search(result.stderr)
     if match:
         hours, minutes, seconds = match.groups()
         return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
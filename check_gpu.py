@@ -1,13 +1,42 @@
-import torch
+"""
+Report the Python/PyTorch/CUDA setup. Run directly: python check_gpu.py
+"""
 import sys
+from functools import lru_cache
 
-print(f"Python: {sys.version}")
-print(f"PyTorch Version: {torch.__version__}")
-print(f"CUDA Available: {torch.cuda.is_available()}")
-print(f"CUDA Version (Torch Build): {torch.version.cuda}")
 
-if torch.cuda.is_available():
-    print(f"Device Name: {torch.cuda.get_device_name(0)}")
-else:
-    print("WARNING: CUDA is NOT available. You are running on CPU.")
-    print("If you have an NVIDIA GPU, you likely installed the wrong PyTorch version.")
+@lru_cache(maxsize=1)
+def gpu_info() -> dict:
+    """
+    Probe PyTorch and CUDA once per process.
+    
+    Returns:
+        Dict with 'torch' (version or None), 'cuda' (bool), 'cuda_version'
+        (torch build) and 'device_name' (None without CUDA)
+    """
+    try:
+        import torch
+    except ImportError:
+        return {"torch": None, "cuda": False, "cuda_version": None, "device_name": None}
+    
+    cuda = torch.cuda.is_available()
+    return {
+        "torch": torch.__version__,
+        "cuda": cuda,
+        "cuda_version": torch.version.cuda,
+        "device_name": torch.cuda.get_device_name(0) if cuda else None,
+    }
+
+
+if __name__ == "__main__":
+    info = gpu_info()
+    print(f"Python: {sys.version}")
+    print(f"PyTorch Version: {info['torch']}")
+    print(f"CUDA Available: {info['cuda']}")
+    print(f"CUDA Version (Torch Build): {info['cuda_version']}")
+    
+    if info["cuda"]:
+        print(f"Device Name: {info['device_name']}")
+    else:
+        print("WARNING: CUDA is NOT available. You are running on CPU.")
+        print("If you have an NVIDIA GPU, you likely installed the wrong PyTorch version.")
@@ -2,8 +2,12 @@
 Cloud Worker for Video Generation.
 Uses DAMO text-to-video model (offline).
 """
-import time
+import logging
 import os
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
 from utils.firebase_utils import init_firebase
 from firebase_admin import firestore
 
@@ -14,6 +18,157 @@ def get_generator():
     return get_modelscope_generator(), "damo"
 
 
+logger = logging.getLogger("cloud_worker")
+
+# How often the idle worker checks that its job listener is still alive
+HEARTBEAT_S = 60
+
+# Common negative prompt
+NEGATIVE_PROMPT = "blurry, low quality, distorted, pixelated, ugly, bad anatomy, deformed, noisy, grainy, watermark, text"
+
+# Apply style to prompt
+STYLE_PROMPTS = MappingProxyType({
+    "Cinematic": "cinematic, film quality, dramatic lighting, ",
+    "Anime": "anime style, vibrant colors, japanese animation, ",
+    "Normal": ""
+})
+
+# Prepended to prompts that do not already ask for quality
+QUALITY_PREFIX = "high quality, 4k, detailed, photorealistic, "
+
+
+def generate_job(generator, job_id: str, data: dict):
+    """
+    Generate the frames for one queued job.
+    
+    Args:
+        generator: Loaded video generator
+        job_id: Firestore document id
+        data: Job document fields
+    
+    Returns:
+        (frames, fps, width, height)
+    """
+    print(f"\n📥 Processing Job: {job_id}")
+    print(f"📝 Prompt: {data.get('prompt')}")
+    
+    # Get settings
+    settings = data.get("settings", {})
+    prompt = data.get("prompt")
+    video_style = settings.get("video_style", "Cinematic")
+    style = STYLE_PROMPTS.get(video_style, "")
+    
+    # Settings
+    num_frames = settings.get("num_frames", 32)
+    fps = settings.get("fps", 8)
+    height = settings.get("height", 512)
+    width = settings.get("width", 512)
+    num_steps = settings.get("num_steps", 40)
+    
+    print(f"🎬 Generating {num_frames} frames at {width}x{height}...")
+    print(f"   Style: {video_style} | Steps: {num_steps}")
+    
+    # Enhance prompt, built in one allocation (the Cinematic style terms
+    # already mention quality, so check them together with the prompt)
+    quality = "" if "quality" in f"{style}{prompt}".lower() else QUALITY_PREFIX
+    enhanced_prompt = f"{quality}{style}{prompt}"
+    
+    # Generate video
+    frames = generator.generate(
+        prompt=enhanced_prompt,
+        num_frames=num_frames,
+        num_inference_steps=num_steps,
+        height=height,
+        width=width,
+        negative_prompt=NEGATIVE_PROMPT,
+        enhance_prompt=True,
+        progress_callback=lambda msg: print(f"   {msg}")
+    )
+    return frames, fps, width, height
+
+
+def job_failed(job_id: str, error: Exception) -> dict:
+    """Log a failed job and build its Firestore error update."""
+    # The traceback is only formatted if a handler accepts the record
+    logger.error("❌ Job %s Failed: %s", job_id, error, exc_info=error)
+    return {
+        "status": "error",
+        "error": str(error)
+    }
+
+
+def finish_job(job_ref, generator, model_name: str, frames, fps: int, width: int, height: int):
+    """
+    Save a job's video and write its final status.
+    
+    Runs on the save thread, so encoding and disk writes overlap with the
+    next job's generation.
+    """
+    job_id = job_ref.id
+    try:
+        # Save video
+        output_dir = "cloud_outputs"
+        os.makedirs(output_dir, exist_ok=True)
+        filename = f"{job_id}.mp4"
+        output_path = os.path.join(output_dir, filename)
+        
+        generator.save_video(frames, output_path, fps=fps)
+        
+        abs_path = os.path.abspath(output_path)
+        
+        print(f"✅ Job {job_id} Completed!")
+        print(f"   📁 Saved to: {abs_path}")
+        update = {
+            "status": "completed",
+            "video_url": abs_path,
+            "resolution": f"{width}x{height}",
+            "model_used": model_name,
+            "completed_at": firestore.SERVER_TIMESTAMP
+        }
+    except Exception as e:
+        update = job_failed(job_id, e)
+    
+    _update(job_ref, update)
+
+
+def _update(job_ref, update: dict):
+    """Write a job update on the I/O thread, logging failures."""
+    try:
+        job_ref.update(update)
+    except Exception as e:
+        print(f"⚠️ Could not update job {job_ref.id}: {e}")
+
+
+def watch_pending_jobs(db, jobs: queue.Queue, seen: set):
+    """
+    Subscribe to pending jobs, putting each new one on `jobs`.
+    
+    Firestore pushes changes to the status == "pending" query, so the
+    worker wakes as soon as a job is queued instead of polling.
+    
+    Args:
+        db: Firestore client
+        jobs: Queue receiving job document snapshots
+        seen: Ids of jobs already queued, shared across resubscriptions
+    
+    Returns:
+        The listener's Watch handle
+    """
+    def on_snapshot(docs, changes, read_time):
+        # Runs on the listener thread
+        for change in changes:
+            doc = change.document
+            if change.type.name == "ADDED" and doc.id not in seen:
+                seen.add(doc.id)
+                jobs.put(doc)
+            elif change.type.name == "REMOVED":
+                # Claimed (or deleted); may be queued again if reset to pending
+                seen.discard(doc.id)
+    
+    query = db.collection("video_queue").where("status", "==", "pending")
+    return query.on_snapshot(on_snapshot)
+
+
 def process_jobs():
     """Main job processing loop."""
     print("🚀 Cloud Worker Started... Waiting for jobs...")
@@ -32,102 +187,44 @@ def process_jobs():
         print("❌ Firebase Init Failed")
         return
 
-    print("🔄 Polling for jobs...")
+    print("🔄 Listening for jobs...")
+    
+    jobs = queue.Queue()
+    seen = set()
+    watch = watch_pending_jobs(db, jobs, seen)
+    
+    # All Firestore writes and saves run in submission order on one thread:
+    # encodes do not compete for CPU, and a job's final status can never
+    # land before its "processing" mark
+    io_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job-io")
     
     while True:
         try:
-            # Query for pending jobs
-            jobs_ref = db.collection("video_queue").where("status", "==", "pending").limit(1)
-            docs = jobs_ref.get()
+            try:
+                doc = jobs.get(timeout=HEARTBEAT_S)
+            except queue.Empty:
+                # Heartbeat: resubscribe if the listener gave up
+                if not getattr(watch, "is_active", True):
+                    print("🔁 Job listener stopped, resubscribing...")
+                    watch = watch_pending_jobs(db, jobs, seen)
+                continue
             
-            for doc in docs:
-                job_id = doc.id
-                data = doc.to_dict()
-                print(f"\n📥 Processing Job: {job_id}")
-                print(f"📝 Prompt: {data.get('prompt')}")
-                
-                try:
-                    # Mark as processing
-                    db.collection("video_queue").document(job_id).update({
-                        "status": "processing",
-                        "model": model_name
-                    })
-                    
-                    # Get settings
-                    settings = data.get("settings", {})
-                    prompt = data.get("prompt")
-                    video_style = settings.get("video_style", "Cinematic")
-                    
-                    # Apply style to prompt
-                    style_prompts = {
-                        "Cinematic": "cinematic, film quality, dramatic lighting, ",
-                        "Anime": "anime style, vibrant colors, japanese animation, ",
-                        "Normal": ""
-                    }
-                    enhanced_prompt = style_prompts.get(video_style, "") + prompt
-                    
-                    # Settings
-                    num_frames = settings.get("num_frames", 32)
-                    fps = settings.get("fps", 8)
-                    height = settings.get("height", 512)
-                    width = settings.get("width", 512)
-                    num_steps = settings.get("num_steps", 40)
-                    
-                    print(f"🎬 Generating {num_frames} frames at {width}x{height}...")
-                    print(f"   Style: {video_style} | Steps: {num_steps}")
-                    
-                    # Common negative prompt
-                    negative_prompt = "blurry, low quality, distorted, pixelated, ugly, bad anatomy, deformed, noisy, grainy, watermark, text"
-                    
-                    # Enhance prompt
-                    quality_terms = "high quality, 4k, detailed, photorealistic"
-                    if "quality" not in enhanced_prompt.lower():
-                        enhanced_prompt = f"{quality_terms}, {enhanced_prompt}"
-                    
-                    # Generate video
-                    frames = generator.generate(
-                        prompt=enhanced_prompt,
-                        num_frames=num_frames,
-                        num_inference_steps=num_steps,
-                        height=height,
-                        width=width,
-                        negative_prompt=negative_prompt,
-                        enhance_prompt=True,
-                        progress_callback=lambda msg: print(f"   {msg}")
-                    )
-                    
-                    # Save video
-                    output_dir = "cloud_outputs"
-                    os.makedirs(output_dir, exist_ok=True)
-                    filename = f"{job_id}.mp4"
-                    output_path = os.path.join(output_dir, filename)
-                    
-                    generator.save_video(frames, output_path, fps=fps)
-                    
-                    abs_path = os.path.abspath(output_path)
-                    
-                    # Update Firestore
-                    db.collection("video_queue").document(job_id).update({
-                        "status": "completed",
-                        "video_url": abs_path,
-                        "resolution": f"{width}x{height}",
-                        "model_used": model_name,
-                        "completed_at": firestore.SERVER_TIMESTAMP
-                    })
-                    
-                    print(f"✅ Job {job_id} Completed!")
-                    print(f"   📁 Saved to: {abs_path}")
-                    
-                except Exception as e:
-                    print(f"❌ Job Failed: {e}")
-                    import traceback
-                    traceback.print_exc()
-                    db.collection("video_queue").document(job_id).update({
-                        "status": "error",
-                        "error": str(e)
-                    })
+            # Mark the job as processing only as its generation starts (sent
+            # in the background), so a worker that stops leaves every job it
+            # has not started as "pending" for the next one to pick up
+            io_pool.submit(_update, doc.reference, {
+                "status": "processing",
+                "model": model_name
+            })
             
-            time.sleep(5)
+            # Saving and the final status happen on the I/O thread while
+            # the next job generates
+            try:
+                result = generate_job(generator, doc.id, doc.to_dict())
+            except Exception as e:
+                io_pool.submit(_update, doc.reference, job_failed(doc.id, e))
+                continue
+            io_pool.submit(finish_job, doc.reference, generator, model_name, *result)
             
         except Exception as e:
             print(f"⚠️ Loop error: {e}")
@@ -135,4 +232,5 @@ def process_jobs():
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     process_jobs()
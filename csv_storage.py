@@ -2,17 +2,55 @@
 CSV Storage Utility for Video Metadata.
 Stores all generated videos (cloud and local) with JSON metadata in CSV format.
 """
+import atexit
 import csv
+import io
 import json
+import mmap
 import os
+import re
+import threading
+import time
 from datetime import datetime
 from pathlib import Path
 from typing import List, Dict, Optional
 
+# Settings JSON goes through orjson when it is installed
+try:
+    import orjson
+    def _dumps(obj) -> str:
+        return orjson.dumps(obj).decode("utf-8")
+    _loads = orjson.loads
+except ImportError:
+    _dumps = json.dumps
+    _loads = json.loads
+
 
 VIDEOS_CSV = "outputs/videos.csv"
+VIDEOS_COUNTER = "outputs/videos.counter"  # next id, so startup never scans the CSV
 CSV_HEADERS = ["id", "prompt", "model", "settings_json", "video_path", "source", "created_at"]
 
+# Rows are appended through one long-lived buffered handle, flushed after
+# FLUSH_EVERY_ROWS rows or once FLUSH_INTERVAL_S has passed since the last
+# flush, and always before the file is read and at exit
+FLUSH_EVERY_ROWS = 8
+FLUSH_INTERVAL_S = 2.0
+
+# Files above this size are read backwards from the end when loading
+TAIL_READ_MIN_BYTES = 256 * 1024
+
+# A line break is a row boundary when the line before it ends with the
+# created_at timestamp and the line after it starts with an id
+_ROW_END = re.compile(rb"\d{4}-\d{2}-\d{2}T[\d:.]+\r?$")
+_ROW_START = re.compile(rb"\d+,")
+
+_lock = threading.RLock()  # saves may run on a background thread
+_file = None
+_writer = None
+_next_id = None
+_pending_rows = 0
+_last_flush = 0.0
+
 
 def ensure_csv_storage():
     """Ensure the CSV file exists with headers."""
@@ -23,16 +61,88 @@ def ensure_csv_storage():
             writer.writeheader()
 
 
-def get_next_id() -> int:
-    """Get the next ID for a new entry."""
-    ensure_csv_storage()
+def _scan_max_id() -> int:
+    """Get the largest id by parsing the whole file."""
+    with open(VIDEOS_CSV, "r", newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        ids = [int(row.get("id", 0)) for row in reader if row.get("id", "").isdigit()]
+        return max(ids) if ids else 0
+
+
+def _last_id(tail_bytes: int = 8192) -> int:
+    """
+    Get the id of the last row from the final few KB of the file.
+    
+    Ids only ever grow, so the last row holds the largest one. Falls back
+    to a full scan if no row starts in the tail.
+    """
+    with open(VIDEOS_CSV, "rb") as f:
+        size = f.seek(0, os.SEEK_END)
+        f.seek(max(size - tail_bytes, 0))
+        tail = f.read().decode("utf-8", errors="ignore")
+    
+    for line in reversed(tail.splitlines()):
+        first = line.split(",", 1)[0]
+        if first.isdigit():
+            return int(first)
+    return _scan_max_id() if size > tail_bytes else 0
+
+
+def _read_counter() -> Optional[int]:
+    """Get the next id stored in the counter file (None if missing or invalid)."""
     try:
-        with open(VIDEOS_CSV, "r", newline="", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            ids = [int(row.get("id", 0)) for row in reader if row.get("id", "").isdigit()]
-            return max(ids) + 1 if ids else 1
-    except Exception:
-        return 1
+        with open(VIDEOS_COUNTER, "r", encoding="utf-8") as f:
+            value = int(f.read().strip())
+        return value if value > 0 else None
+    except (OSError, ValueError):
+        return None
+
+
+def _write_counter(value: int):
+    """Persist the next id atomically (write a temp file, then os.replace)."""
+    tmp_path = VIDEOS_COUNTER + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(str(value))
+    os.replace(tmp_path, VIDEOS_COUNTER)
+
+
+def get_next_id() -> int:
+    """Get the next ID for a new entry (read from disk once per process)."""
+    global _next_id
+    with _lock:
+        if _next_id is None:
+            ensure_csv_storage()
+            _next_id = _read_counter()
+            if _next_id is None:
+                # No usable counter yet: seed it from the CSV once
+                try:
+                    _next_id = _last_id() + 1
+                except Exception:
+                    _next_id = 1
+        return _next_id
+
+
+def _get_writer():
+    """Get the csv.writer over the shared append handle, opening it on first use."""
+    global _file, _writer
+    if _writer is None:
+        ensure_csv_storage()
+        _file = open(VIDEOS_CSV, "a", buffering=1 << 20, newline="", encoding="utf-8")
+        _writer = csv.writer(_file)
+    return _writer
+
+
+def flush_csv():
+    """Write any buffered rows to disk."""
+    global _pending_rows, _last_flush
+    with _lock:
+        if _file is not None:
+            _file.flush()
+        _pending_rows = 0
+        _last_flush = time.monotonic()
+
+
+atexit.register(flush_csv)
 
 
 def save_video_to_csv(
@@ -55,23 +165,75 @@ def save_video_to_csv(
     Returns:
         The saved entry as a dictionary
     """
-    ensure_csv_storage()
+    global _next_id, _pending_rows
+    settings_json = _dumps(settings or {})
     
-    entry = {
-        "id": get_next_id(),
-        "prompt": prompt,
-        "model": model,
-        "settings_json": json.dumps(settings or {}),
-        "video_path": video_path,
-        "source": source,
-        "created_at": datetime.now().isoformat()
-    }
+    with _lock:
+        # Row tuple in CSV_HEADERS order
+        row = (
+            get_next_id(),
+            prompt,
+            model,
+            settings_json,
+            video_path,
+            source,
+            datetime.now().isoformat()
+        )
+        _get_writer().writerow(row)
+        _next_id += 1
+        try:
+            _write_counter(_next_id)
+        except OSError as e:
+            print(f"Video id counter not saved: {e}")
+        _pending_rows += 1
+        if _pending_rows >= FLUSH_EVERY_ROWS or time.monotonic() - _last_flush >= FLUSH_INTERVAL_S:
+            flush_csv()
     
-    with open(VIDEOS_CSV, "a", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=CSV_HEADERS)
-        writer.writerow(entry)
+    return dict(zip(CSV_HEADERS, row))
+
+
+def _read_tail_rows(limit: int) -> Optional[List[Dict]]:
+    """
+    Parse only the last `limit` rows, scanning backwards through an mmap.
     
-    return entry
+    Returns:
+        Rows, most recent first, or None if the file has fewer rows or the
+        tail does not parse as whole rows (callers then read the full file)
+    """
+    with open(VIDEOS_CSV, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        # Skip the final row terminator
+        search_end = len(mm) - 1
+        start = None
+        found = 0
+        while found < limit:
+            newline = mm.rfind(b"\n", 0, search_end)
+            if newline < 0:
+                return None
+            search_end = newline
+            # Quoted prompts may contain line breaks, so check both sides
+            if _ROW_START.match(mm, newline + 1) and _ROW_END.search(mm[max(newline - 64, 0):newline]):
+                start = newline + 1
+                found += 1
+        tail = mm[start:].decode("utf-8")
+    
+    rows = list(csv.reader(io.StringIO(tail, newline="")))
+    if len(rows) != limit or any(len(row) != len(CSV_HEADERS) for row in rows):
+        return None
+    return [dict(zip(CSV_HEADERS, row)) for row in reversed(rows)]
+
+
+def _read_all_rows(limit: int) -> List[Dict]:
+    """Parse the whole file and return the last `limit` rows, most recent first."""
+    try:
+        import pandas as pd
+        # C parser; every column kept as the raw string, as csv would
+        df = pd.read_csv(VIDEOS_CSV, dtype=str, keep_default_na=False)
+        return df.iloc[::-1].head(limit).to_dict("records")
+    except ImportError:
+        with open(VIDEOS_CSV, "r", newline="", encoding="utf-8") as f:
+            rows = list(csv.reader(f))
+        header = rows[0] if rows else CSV_HEADERS
+        return [dict(zip(header, row)) for row in rows[:0:-1][:limit]]
 
 
 def load_videos_from_csv(limit: int = 50) -> List[Dict]:
@@ -85,22 +247,23 @@ def load_videos_from_csv(limit: int = 50) -> List[Dict]:
         List of video entries with parsed settings
     """
     ensure_csv_storage()
+    flush_csv()
     
     try:
-        with open(VIDEOS_CSV, "r", newline="", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            entries = []
-            for row in reader:
-                # Parse JSON settings
-                try:
-                    row["settings"] = json.loads(row.get("settings_json", "{}"))
-                except json.JSONDecodeError:
-                    row["settings"] = {}
-                entries.append(row)
-            
-            # Return most recent first
-            entries.reverse()
-            return entries[:limit]
+        entries = None
+        if limit > 0 and os.path.getsize(VIDEOS_CSV) > TAIL_READ_MIN_BYTES:
+            # Most recent rows only, without reading the rest of the file
+            entries = _read_tail_rows(limit)
+        if entries is None:
+            entries = _read_all_rows(limit)
+        
+        # Parse JSON settings, only for the rows returned
+        for entry in entries:
+            try:
+                entry["settings"] = _loads(entry.get("settings_json") or "{}")
+            except json.JSONDecodeError:
+                entry["settings"] = {}
+        return entries
     except Exception:
         return []
 
@@ -108,4 +271,5 @@ def load_videos_from_csv(limit: int = 50) -> List[Dict]:
 def export_videos_csv_path() -> str:
     """Return the path to the videos CSV file for download."""
     ensure_csv_storage()
+    flush_csv()
     return os.path.abspath(VIDEOS_CSV)
@@ -3,9 +3,13 @@ Qwen 3 Coder Error-Fixing Agent.
 Automatically detects and fixes errors in the video generation workflow.
 Downloads model for offline use after first internet connection.
 """
-import os
+import hashlib
 import json
+import re
+import time
 import traceback
+from collections import deque
+from datetime import datetime
 from typing import Dict, Optional, Callable
 from pathlib import Path
 
@@ -13,6 +17,62 @@ from pathlib import Path
 MODEL_CACHE_DIR = Path("models/qwen3_coder_cache")
 MODEL_ID = "Qwen/Qwen3-Coder-1.5B"  # Lightweight coder model
 
+SYSTEM_PROMPT = """You are an expert Python debugger. Analyze the error and provide:
+1. Root cause of the error
+2. Specific fix to apply
+3. Whether the error is recoverable
+
+Respond in JSON format only."""
+
+# Bounds for the error log and the per-signature model analysis cache
+MAX_ERROR_HISTORY = 500
+MAX_CACHED_ANALYSES = 128
+
+# Stand-in for the user message when splitting the chat template
+_USER_SLOT = "\x00USER\x00"
+
+# Every keyword the rule-based fallback looks for, found in one regex pass
+_ERROR_KEYWORDS = re.compile(
+    r"model_not_supported|not supported by any provider|out of memory|cuda"
+    r"|connection|timeout|firebase|firestore|token|invalid|expired",
+    re.IGNORECASE
+)
+
+# Rules in priority order: each alternative is a set of keywords that must
+# all be present, followed by the analysis to return
+_ERROR_RULES = (
+    (({"model_not_supported"}, {"not supported by any provider"}), {
+        "root_cause": "The specified model is not available on HuggingFace Inference API",
+        "fix_suggestion": "Switch to a supported model like Qwen/Qwen2.5-72B-Instruct or mistralai/Mistral-7B-Instruct-v0.3",
+        "is_recoverable": True,
+        "auto_fix": "switch_model"
+    }),
+    (({"cuda", "out of memory"},), {
+        "root_cause": "GPU memory exhausted",
+        "fix_suggestion": "Reduce batch size, use CPU offloading, or restart the application",
+        "is_recoverable": True,
+        "auto_fix": "reduce_memory"
+    }),
+    (({"connection"}, {"timeout"}), {
+        "root_cause": "Network connection issue",
+        "fix_suggestion": "Check internet connection and retry",
+        "is_recoverable": True,
+        "auto_fix": "retry"
+    }),
+    (({"firebase"}, {"firestore"}), {
+        "root_cause": "Firebase/Firestore connection error",
+        "fix_suggestion": "Check Firebase configuration and service account key",
+        "is_recoverable": True,
+        "auto_fix": "retry_firebase"
+    }),
+    (({"token", "invalid"}, {"token", "expired"}), {
+        "root_cause": "Invalid or expired authentication token",
+        "fix_suggestion": "Update HF_TOKEN in .env file",
+        "is_recoverable": False,
+        "auto_fix": None
+    }),
+)
+
 
 class ErrorFixingAgent:
     """Agent that automatically detects and attempts to fix workflow errors."""
@@ -20,8 +80,11 @@ class ErrorFixingAgent:
     def __init__(self):
         self.model = None
         self.tokenizer = None
+        self._prefix_ids = None  # system turn + user header, tokenized once
+        self._suffix_text = ""  # template text after the user message
         self.is_loaded = False
-        self.error_history = []
+        self.error_history = deque(maxlen=MAX_ERROR_HISTORY)
+        self._analysis_cache = {}  # error signature -> model analysis, oldest first
         self.fix_attempts = 0
         self.max_fix_attempts = 3
         
@@ -38,8 +101,8 @@ class ErrorFixingAgent:
             from transformers import AutoModelForCausalLM, AutoTokenizer
             
             # Check for HF token
-            from . import HF_TOKEN
-            token = HF_TOKEN or os.getenv("HF_TOKEN")
+            from . import get_hf_token, BF16_SUPPORTED, DEVICE
+            token = get_hf_token()
             
             # Create cache directory
             MODEL_CACHE_DIR.mkdir(parents=True, exist_ok=True)
@@ -55,16 +118,19 @@ class ErrorFixingAgent:
             )
             
             # Load in 4-bit for efficiency
+            compute_dtype = torch.bfloat16 if BF16_SUPPORTED else torch.float16
             self.model = AutoModelForCausalLM.from_pretrained(
                 MODEL_ID,
                 token=token,
                 cache_dir=str(MODEL_CACHE_DIR),
-                torch_dtype=torch.float16,
                 device_map="auto",
                 trust_remote_code=True,
-                low_cpu_mem_usage=True
+                low_cpu_mem_usage=True,
+                **self._weight_kwargs(compute_dtype, DEVICE == "cuda")
             )
             
+            self._cache_prompt_template()
+            
             self.is_loaded = True
             if progress_callback:
                 progress_callback("Qwen 3 Coder agent ready!")
@@ -74,6 +140,51 @@ class ErrorFixingAgent:
             print(f"Error loading Qwen 3 Coder: {e}")
             return False
     
+    @staticmethod
+    def _weight_kwargs(compute_dtype, cuda: bool) -> Dict:
+        """
+        Get the from_pretrained weight options.
+        
+        NF4 4-bit weights with double quantization (about a third of the
+        fp16 footprint) when bitsandbytes is installed and CUDA is available,
+        plain compute_dtype weights otherwise.
+        """
+        if cuda:
+            try:
+                import bitsandbytes  # noqa: F401
+                from transformers import BitsAndBytesConfig
+                return {
+                    "quantization_config": BitsAndBytesConfig(
+                        load_in_4bit=True,
+                        bnb_4bit_compute_dtype=compute_dtype,
+                        bnb_4bit_quant_type="nf4",
+                        bnb_4bit_use_double_quant=True
+                    )
+                }
+            except ImportError:
+                print("bitsandbytes not installed, loading the agent without quantization")
+        return {"torch_dtype": compute_dtype}
+    
+    def _cache_prompt_template(self):
+        """
+        Tokenize the static part of the chat prompt once.
+        
+        The template is rendered around a placeholder user message; the text
+        before it (system turn and user header) is tokenized and kept on the
+        model's device, the text after it (generation prompt) is kept as text.
+        """
+        messages = [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": _USER_SLOT}
+        ]
+        template = self.tokenizer.apply_chat_template(
+            messages,
+            tokenize=False,
+            add_generation_prompt=True
+        )
+        prefix, self._suffix_text = template.split(_USER_SLOT, 1)
+        self._prefix_ids = self.tokenizer(prefix, return_tensors="pt").input_ids.to(self.model.device)
+    
     def analyze_error(
         self, 
         error_message: str, 
@@ -95,34 +206,48 @@ class ErrorFixingAgent:
         self.error_history.append({
             "error": error_message,
             "context": error_context,
-            "timestamp": self._get_timestamp()
+            "timestamp": time.time()  # formatted only when statistics are read
         })
         
         # Try to fix with loaded model, or use rule-based fallback
         if self.is_loaded and self.model is not None:
-            return self._analyze_with_model(error_message, error_context, progress_callback)
+            # Repeated failures reuse the earlier analysis instead of decoding again
+            key = self._error_signature(error_message, error_context)
+            if key in self._analysis_cache:
+                return dict(self._analysis_cache[key])
+            
+            analysis = self._analyze_with_model(error_message, error_context, progress_callback)
+            if analysis is None:
+                # Model failed this time; the rule answer is not cached so
+                # the next occurrence tries the model again
+                return self._analyze_with_rules(error_message, error_context)
+            if len(self._analysis_cache) >= MAX_CACHED_ANALYSES:
+                # Dicts keep insertion order, so the first key is the oldest
+                del self._analysis_cache[next(iter(self._analysis_cache))]
+            self._analysis_cache[key] = analysis
+            return dict(analysis)
         else:
             return self._analyze_with_rules(error_message, error_context)
     
+    @staticmethod
+    def _error_signature(error_message: str, error_context: Dict) -> str:
+        """Hash the start of the message and the failing function into a cache key."""
+        text = error_message[:256] + "\x00" + str(error_context.get("function", ""))
+        return hashlib.blake2b(text.encode("utf-8", errors="replace"), digest_size=8).hexdigest()
+    
     def _analyze_with_model(
         self, 
         error_message: str, 
         error_context: Dict,
         progress_callback: Optional[Callable] = None
-    ) -> Dict:
-        """Use Qwen 3 Coder to analyze error."""
+    ) -> Optional[Dict]:
+        """Use Qwen 3 Coder to analyze error (None if it fails or gives no JSON)."""
         import torch
+        from . import inference
         
         if progress_callback:
             progress_callback("Analyzing error with Qwen 3 Coder...")
         
-        system_prompt = """You are an expert Python debugger. Analyze the error and provide:
-1. Root cause of the error
-2. Specific fix to apply
-3. Whether the error is recoverable
-
-Respond in JSON format only."""
-
         user_prompt = f"""Error Message:
 {error_message}
 
@@ -133,26 +258,25 @@ Context:
 
 Provide analysis as JSON with keys: root_cause, fix_suggestion, is_recoverable, fix_code"""
 
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ]
-        
         try:
-            input_text = self.tokenizer.apply_chat_template(
-                messages,
-                tokenize=False,
-                add_generation_prompt=True
-            )
-            
-            inputs = self.tokenizer(input_text, return_tensors="pt").to(self.model.device)
+            # Only the user message and the generation prompt are tokenized
+            # per call; the system turn comes from the cached prefix
+            user_ids = self.tokenizer(
+                user_prompt + self._suffix_text,
+                return_tensors="pt",
+                add_special_tokens=False
+            ).input_ids.to(self.model.device)
+            input_ids = torch.cat([self._prefix_ids, user_ids], dim=1)
             
-            with torch.no_grad():
+            # Greedy decoding: deterministic JSON, no sampling overhead
+            with inference():
                 outputs = self.model.generate(
-                    **inputs,
+                    input_ids=input_ids,
+                    attention_mask=torch.ones_like(input_ids),
                     max_new_tokens=500,
-                    temperature=0.3,
-                    do_sample=True,
+                    do_sample=False,
+                    num_beams=1,
+                    use_cache=True,
                     pad_token_id=self.tokenizer.eos_token_id
                 )
             
@@ -168,53 +292,15 @@ Provide analysis as JSON with keys: root_cause, fix_suggestion, is_recoverable,
         except Exception as e:
             print(f"Model analysis failed: {e}")
         
-        # Fallback to rules
-        return self._analyze_with_rules(error_message, error_context)
+        return None
     
     def _analyze_with_rules(self, error_message: str, error_context: Dict) -> Dict:
         """Rule-based error analysis fallback."""
-        error_lower = error_message.lower()
-        
         # Common error patterns and fixes
-        if "model_not_supported" in error_lower or "not supported by any provider" in error_lower:
-            return {
-                "root_cause": "The specified model is not available on HuggingFace Inference API",
-                "fix_suggestion": "Switch to a supported model like Qwen/Qwen2.5-72B-Instruct or mistralai/Mistral-7B-Instruct-v0.3",
-                "is_recoverable": True,
-                "auto_fix": "switch_model"
-            }
-        
-        elif "cuda" in error_lower and "out of memory" in error_lower:
-            return {
-                "root_cause": "GPU memory exhausted",
-                "fix_suggestion": "Reduce batch size, use CPU offloading, or restart the application",
-                "is_recoverable": True,
-                "auto_fix": "reduce_memory"
-            }
-        
-        elif "connection" in error_lower or "timeout" in error_lower:
-            return {
-                "root_cause": "Network connection issue",
-                "fix_suggestion": "Check internet connection and retry",
-                "is_recoverable": True,
-                "auto_fix": "retry"
-            }
-        
-        elif "firebase" in error_lower or "firestore" in error_lower:
-            return {
-                "root_cause": "Firebase/Firestore connection error",
-                "fix_suggestion": "Check Firebase configuration and service account key",
-                "is_recoverable": True,
-                "auto_fix": "retry_firebase"
-            }
-        
-        elif "token" in error_lower and ("invalid" in error_lower or "expired" in error_lower):
-            return {
-                "root_cause": "Invalid or expired authentication token",
-                "fix_suggestion": "Update HF_TOKEN in .env file",
-                "is_recoverable": False,
-                "auto_fix": None
-            }
+        found = {m.lower() for m in _ERROR_KEYWORDS.findall(error_message)}
+        for alternatives, analysis in _ERROR_RULES:
+            if any(keywords <= found for keywords in alternatives):
+                return dict(analysis)
         
         return {
             "root_cause": "Unknown error",
@@ -291,13 +377,15 @@ Provide analysis as JSON with keys: root_cause, fix_suggestion, is_recoverable,
         return {
             "total_errors": len(self.error_history),
             "fix_attempts": self.fix_attempts,
-            "recent_errors": self.error_history[-5:] if self.error_history else []
+            "recent_errors": [
+                {**entry, "timestamp": self._get_timestamp(entry["timestamp"])}
+                for entry in list(self.error_history)[-5:]
+            ]
         }
     
-    def _get_timestamp(self) -> str:
-        """Get current timestamp."""
-        from datetime import datetime
-        return datetime.now().isoformat()
+    def _get_timestamp(self, epoch: Optional[float] = None) -> str:
+        """Get an ISO timestamp for `epoch` (seconds since the epoch, default now)."""
+        return datetime.fromtimestamp(time.time() if epoch is None else epoch).isoformat(timespec="seconds")
 
 
 # Singleton instance
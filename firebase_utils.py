@@ -1,12 +1,50 @@
 import os
+import base64
+import logging
+import threading
+import time
+from functools import lru_cache
 import firebase_admin
 from firebase_admin import credentials, firestore
 import streamlit as st
 import json
 
+# REST bodies are serialized with orjson when installed (faster, and it
+# produces bytes directly), with the stdlib json module otherwise
+try:
+    import orjson
+    _dumps_bytes = orjson.dumps
+    _loads = orjson.loads
+except ImportError:
+    def _dumps_bytes(obj):
+        return json.dumps(obj).encode("utf-8")
+    _loads = json.loads
+
+logger = logging.getLogger(__name__)
+
 # Singleton database instance
 _db = None
 
+# After a failed init, calls return None without retrying for this long
+INIT_RETRY_S = 30
+_init_failed_at = None
+
+@lru_cache(maxsize=1)
+def _use_streamlit_secrets():
+    """Check once whether Streamlit secrets hold a firebase config."""
+    try:
+        return hasattr(st, 'secrets') and 'firebase' in st.secrets
+    except Exception:
+        # No secrets.toml (or not running under Streamlit)
+        return False
+
+# REST fallback state, built on first use: service account credentials
+# (token refreshed only when expired), project id and a keep-alive session
+_rest_creds = None
+_rest_project_id = None
+_rest_session = None
+_rest_lock = threading.Lock()
+
 def init_firebase():
     """Initialize Firebase Admin SDK.
     
@@ -14,26 +52,33 @@ def init_firebase():
     1. Local: Uses serviceAccountKey.json file
     2. Streamlit Cloud: Uses st.secrets["firebase"] configuration
     """
-    global _db
+    global _db, _init_failed_at
     if _db:
         return _db
+    if _init_failed_at is not None and time.monotonic() - _init_failed_at < INIT_RETRY_S:
+        return None
     
+    _db = _init_firebase()
+    _init_failed_at = None if _db else time.monotonic()
+    return _db
+
+def _init_firebase():
+    """Create the Firestore client (None on failure)."""
     try:
         # Check if already initialized
         if firebase_admin._apps:
             print("DEBUG: Firebase App already initialized.")
-            _db = firestore.client()
-            return _db
+            return firestore.client()
         
         # Try Streamlit secrets first (for cloud deployment)
-        if hasattr(st, 'secrets') and 'firebase' in st.secrets:
+        if _use_streamlit_secrets():
             print("DEBUG: Using Streamlit secrets for Firebase...")
             firebase_config = dict(st.secrets["firebase"])
             cred = credentials.Certificate(firebase_config)
             firebase_admin.initialize_app(cred)
-            _db = firestore.client()
+            db = firestore.client()
             print("DEBUG: Firebase initialized from Streamlit secrets!")
-            return _db
+            return db
         
         # Fallback to local JSON file
         key_path = "serviceAccountKey.json"
@@ -49,9 +94,9 @@ def init_firebase():
         cred = credentials.Certificate(key_path)
         firebase_admin.initialize_app(cred)
             
-        _db = firestore.client()
+        db = firestore.client()
         print("DEBUG: Firestore Client created.")
-        return _db
+        return db
     except Exception as e:
         print(f"DEBUG: Firebase Init Error: {e}")
         return None
@@ -71,16 +116,10 @@ def submit_job_to_cloud(prompt: str, settings: dict):
     
     try:
         # Create a document in 'video_jobs'
-        # We store all settings so the worker knows what to do
-        job_data = {
-            "prompt": prompt,
-            "settings": settings,
-            "status": "pending",
-            "created_at": firestore.SERVER_TIMESTAMP,
-            "user_id": "generic_user" # Placeholder
-        }
-        
-        update_time, doc_ref = db.collection("video_queue").add(job_data)
+        # We store all settings so the worker knows what to do.
+        # The id is generated client-side, so this is a single create RPC
+        doc_ref = db.collection("video_queue").document()
+        doc_ref.create(_job_data(prompt, settings))
         return {
             "success": True, 
             "job_id": doc_ref.id,
@@ -92,40 +131,109 @@ def submit_job_to_cloud(prompt: str, settings: dict):
         print(f"SDK Failed ({e}), attempting REST Fallback...")
         return submit_job_via_rest(prompt, settings)
 
-def submit_job_via_rest(prompt, settings):
-    """Fallback method using HTTP requests to bypass gRPC blocking."""
-    import json
-    import requests
-    import google.auth.transport.requests
-    import google.oauth2.service_account
+def _to_fs_default(v):
+    """Encode values whose exact type has no entry in _FS_ENCODERS."""
+    if isinstance(v, bool): return {"booleanValue": v}
+    if isinstance(v, int): return {"integerValue": str(v)}
+    if isinstance(v, float): return {"doubleValue": v}
+    if isinstance(v, str): return {"stringValue": v}
+    if isinstance(v, dict): return _FS_ENCODERS[dict](v)
+    if isinstance(v, (list, tuple)): return _FS_ENCODERS[list](v)
+    return {"stringValue": str(v)}
+
+# Firestore REST value encoders keyed on the exact type: one dict lookup per
+# value, and bool can never be mistaken for its int base class
+_FS_ENCODERS = {
+    str: lambda v: {"stringValue": v},
+    bool: lambda v: {"booleanValue": v},
+    int: lambda v: {"integerValue": str(v)},
+    float: lambda v: {"doubleValue": v},
+    type(None): lambda v: {"nullValue": None},
+    bytes: lambda v: {"bytesValue": base64.b64encode(v).decode("ascii")},
+    dict: lambda v: {"mapValue": {"fields": {k: to_fs(val) for k, val in v.items()}}},
+    list: lambda v: {"arrayValue": {"values": [to_fs(x) for x in v]}},
+}
+_FS_ENCODERS[tuple] = _FS_ENCODERS[list]
+
+def to_fs(v):
+    """Format a Python value as a typed Firestore REST value."""
+    return _FS_ENCODERS.get(type(v), _to_fs_default)(v)
+
+# Firestore REST value decoders keyed on the value's single type key
+_FS_DECODERS = {
+    "stringValue": lambda v: v,
+    "booleanValue": lambda v: v,
+    "integerValue": int,
+    "doubleValue": float,
+    "nullValue": lambda v: None,
+    "timestampValue": lambda v: v,
+    "bytesValue": base64.b64decode,
+    "mapValue": lambda v: {k: from_fs(val) for k, val in v.get("fields", {}).items()},
+    "arrayValue": lambda v: [from_fs(x) for x in v.get("values", [])],
+}
+
+def from_fs(v):
+    """Unwrap a typed Firestore REST value (None if absent)."""
+    if not v: return None
+    kind = next(iter(v))
+    decoder = _FS_DECODERS.get(kind)
+    return decoder(v[kind]) if decoder else str(v)
+
+def _job_data(prompt, settings):
+    """Build the Firestore document for a queued job."""
+    return {
+        "prompt": prompt,
+        "settings": settings,
+        "status": "pending",
+        "created_at": firestore.SERVER_TIMESTAMP,
+        "user_id": "generic_user" # Placeholder
+    }
+
+def submit_jobs_to_cloud(jobs):
+    """
+    Submit several jobs to the Cloud Queue in one batched commit.
+    
+    Args:
+        jobs: List of (prompt, settings) tuples
+    
+    Returns:
+        List of submit results, in the order of `jobs`
+    """
+    db = init_firebase()
+    if not db:
+        return [{
+            "success": False, 
+            "message": "Firebase not configured. Missing 'serviceAccountKey.json'."
+        } for _ in jobs]
     
+    committed = []
     try:
-        key_path = "serviceAccountKey.json"
-        
-        # 1. Get Project ID
-        with open(key_path) as f:
-            key_data = json.load(f)
-            project_id = key_data["project_id"]
-            
-        # 2. Get Access Token
-        creds = google.oauth2.service_account.Credentials.from_service_account_file(
-            key_path, 
-            scopes=["https://www.googleapis.com/auth/datastore"]
-        )
-        auth_req = google.auth.transport.requests.Request()
-        creds.refresh(auth_req)
-        token = creds.token
+        collection = db.collection("video_queue")
+        # Firestore accepts at most 500 writes per batch
+        for start in range(0, len(jobs), 500):
+            batch = db.batch()
+            refs = []
+            for prompt, settings in jobs[start:start + 500]:
+                ref = collection.document()
+                batch.create(ref, _job_data(prompt, settings))
+                refs.append(ref)
+            batch.commit()
+            committed += [{"success": True, "job_id": ref.id, "message": "Job queued successfully!"} for ref in refs]
+        return committed
         
-        # 3. Helper to format for Firestore REST API
-        def to_fs(v):
-            if isinstance(v, str): return {"stringValue": v}
-            if isinstance(v, bool): return {"booleanValue": v}
-            if isinstance(v, int): return {"integerValue": str(v)}
-            if isinstance(v, float): return {"doubleValue": v}
-            if isinstance(v, dict): 
-                return {"mapValue": {"fields": {k: to_fs(val) for k, val in v.items()}}}
-            return {"stringValue": str(v)}
+    except Exception as e:
+        # Fallback to REST API if gRPC fails (Firewall issues). Earlier
+        # chunks may have been committed already, so only resend the rest.
+        print(f"SDK Failed ({e}), attempting REST Fallback...")
+        return committed + submit_jobs_via_rest(jobs[len(committed):])
 
+def submit_job_via_rest(prompt, settings):
+    """Fallback method using HTTP requests to bypass gRPC blocking."""
+    try:
+        # 1-2. Project ID and Access Token
+        project_id, token = _rest_credentials()
+        
+        # 3. Values are formatted for Firestore REST API by to_fs()
         # 4. Construct Payload
         # Use simple timestamp string instead of server timestamp for REST
         import datetime
@@ -148,10 +256,10 @@ def submit_job_via_rest(prompt, settings):
             "Content-Type": "application/json"
         }
         
-        resp = requests.post(url, headers=headers, json=payload)
+        resp = _get_rest_session().post(url, headers=headers, data=_dumps_bytes(payload))
         
         if resp.status_code == 200:
-            doc_id = resp.json()["name"].split("/")[-1]
+            doc_id = _loads(resp.content)["name"].split("/")[-1]
             return {"success": True, "job_id": doc_id, "message": "Job queued via HTTP (Firewall Bypass)!"}
         else:
             return {"success": False, "message": f"REST Error {resp.status_code}: {resp.text}"}
@@ -159,75 +267,164 @@ def submit_job_via_rest(prompt, settings):
     except Exception as e:
         return {"success": False, "message": f"REST Connection Failed: {str(e)}"}
 
-def get_job_status(job_id):
-    """Check status of a cloud job."""
-    print(f"DEBUG: Checking status for {job_id}")
+def submit_jobs_via_rest(jobs, max_workers=8):
+    """Submit several jobs over REST concurrently on the shared session.
+    
+    Args:
+        jobs: List of (prompt, settings) tuples
+        max_workers: Requests in flight at once
+    
+    Returns:
+        List of submit results, in the order of `jobs`
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(lambda job: submit_job_via_rest(*job), jobs))
+
+# Only these fields are read back when polling a job
+STATUS_FIELDS = ["status", "video_url", "error"]
+
+def _delta(result, since):
+    """Collapse a status result to a no-change marker if it is not newer than `since`."""
+    if result and since and result.get("update_time") == since:
+        return {"unchanged": True, "update_time": since}
+    return result
+
+def get_job_status(job_id, since=None):
+    """Check status of a cloud job.
+    
+    Only STATUS_FIELDS are fetched. Pass the previous result's
+    "update_time" as `since` to get {"unchanged": True} back when the job
+    document has not been written since.
+    """
+    return _delta(get_job_statuses([job_id]).get(job_id), since)
+
+def get_job_statuses(job_ids):
+    """Check the status of several cloud jobs in one round trip.
+    
+    Uses one batched SDK read (get_all), falling back to a single REST
+    batchGet for any job the SDK could not return.
+    
+    Returns:
+        Dict of job_id -> status dict ("status", "video_url", "error",
+        "update_time"), or None for jobs that could not be read
+    """
+    job_ids = list(dict.fromkeys(job_ids))
+    # Runs on every status poll, so only logged at debug level
+    logger.debug("Checking status for %s", job_ids)
+    results = {}
     try:
         # Try SDK first
         db = init_firebase()
         if db:
-            doc = db.collection("video_queue").document(job_id).get()
-            if doc.exists:
-                return doc.to_dict()
+            collection = db.collection("video_queue")
+            refs = [collection.document(job_id) for job_id in job_ids]
+            for doc in db.get_all(refs, field_paths=STATUS_FIELDS):
+                if doc.exists:
+                    result = doc.to_dict()
+                    result["update_time"] = doc.update_time.isoformat() if doc.update_time else None
+                    results[doc.id] = result
     except Exception as e:
         print(f"DEBUG: SDK Status Check Failed ({e})")
     
     # Fallback to REST
-    return get_job_status_via_rest(job_id)
+    missing = [job_id for job_id in job_ids if job_id not in results]
+    if missing:
+        results.update(get_job_statuses_via_rest(missing))
+    return results
 
-def get_job_status_via_rest(job_id):
-    """Retrieve job via REST API."""
-    import json
-    import requests
+def _get_rest_session():
+    """Get the shared requests.Session (reuses TCP/TLS connections).
+    
+    Up to 16 pooled connections; idempotent requests are retried with
+    backoff on throttling and 5xx responses. POSTs are never retried, so a
+    submission can not be queued twice.
+    """
+    global _rest_session
+    if _rest_session is None:
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+        session = requests.Session()
+        session.mount("https://", HTTPAdapter(
+            pool_connections=16,
+            pool_maxsize=16,
+            max_retries=Retry(total=3, backoff_factor=0.2, status_forcelist=[429, 500, 502, 503, 504])
+        ))
+        _rest_session = session
+    return _rest_session
+
+def _rest_credentials():
+    """Get (project_id, access token) for the Firestore REST API.
+    
+    The key file is read once per process and the token is only refreshed
+    when it is missing or expired.
+    """
+    global _rest_creds, _rest_project_id
     import google.auth.transport.requests
     import google.oauth2.service_account
     
-    try:
-        key_path = "serviceAccountKey.json"
+    with _rest_lock:
+        if _rest_creds is None:
+            key_path = "serviceAccountKey.json"
+            
+            with open(key_path) as f:
+                key_data = json.load(f)
+            
+            _rest_creds = google.oauth2.service_account.Credentials.from_service_account_info(
+                key_data, 
+                scopes=["https://www.googleapis.com/auth/datastore"]
+            )
+            _rest_project_id = key_data["project_id"]
         
+        if not _rest_creds.valid:
+            # Covers both the first call (no token yet) and expiry
+            auth_req = google.auth.transport.requests.Request(session=_get_rest_session())
+            _rest_creds.refresh(auth_req)
+        return _rest_project_id, _rest_creds.token
+
+def get_job_status_via_rest(job_id):
+    """Retrieve job via REST API (status fields only)."""
+    return get_job_statuses_via_rest([job_id]).get(job_id)
+
+def get_job_statuses_via_rest(job_ids):
+    """Retrieve several jobs with one REST batchGet (status fields only)."""
+    results = {job_id: None for job_id in job_ids}
+    try:
         # 1. Credentials
-        with open(key_path) as f:
-            key_data = json.load(f)
-            project_id = key_data["project_id"]
-            
-        creds = google.oauth2.service_account.Credentials.from_service_account_file(
-            key_path, 
-            scopes=["https://www.googleapis.com/auth/datastore"]
-        )
-        auth_req = google.auth.transport.requests.Request()
-        creds.refresh(auth_req)
-        token = creds.token
+        project_id, token = _rest_credentials()
         
-        # 2. GET Request
-        url = f"https://firestore.googleapis.com/v1/projects/{project_id}/databases/(default)/documents/video_queue/{job_id}"
-        headers = {"Authorization": f"Bearer {token}"}
+        # 2. One POST for every document
+        database = f"projects/{project_id}/databases/(default)"
+        url = f"https://firestore.googleapis.com/v1/{database}/documents:batchGet"
+        headers = {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json"
+        }
+        payload = {
+            "documents": [f"{database}/documents/video_queue/{job_id}" for job_id in job_ids],
+            "mask": {"fieldPaths": STATUS_FIELDS}
+        }
         
-        resp = requests.get(url, headers=headers)
+        resp = _get_rest_session().post(url, headers=headers, data=_dumps_bytes(payload))
         
         if resp.status_code == 200:
-            data = resp.json()
-            fields = data.get("fields", {})
-            
-            # Helper to unwrap Firestore types
-            def from_fs(v):
-                if not v: return None
-                if "stringValue" in v: return v["stringValue"]
-                if "booleanValue" in v: return v["booleanValue"]
-                if "integerValue" in v: return int(v["integerValue"])
-                if "mapValue" in v:
-                    return {k: from_fs(val) for k, val in v["mapValue"]["fields"].items()}
-                return str(v)
-
-            result = {
-                "status": from_fs(fields.get("status")),
-                "video_url": from_fs(fields.get("video_url")),
-                "error": from_fs(fields.get("error"))
-            }
-            return result
+            # One entry per requested document, either "found" or "missing"
+            for item in _loads(resp.content):
+                data = item.get("found")
+                if not data:
+                    continue
+                fields = data.get("fields", {})
+                results[data["name"].split("/")[-1]] = {
+                    "status": from_fs(fields.get("status")),
+                    "video_url": from_fs(fields.get("video_url")),
+                    "error": from_fs(fields.get("error")),
+                    "update_time": data.get("updateTime")
+                }
         else:
             print(f"DEBUG: REST Status Error: {resp.text}")
-            return None
             
     except Exception as e:
         print(f"DEBUG: REST Check Failed: {e}")
-        return None
+    return results
@@ -4,7 +4,15 @@ This runs on HuggingFace's servers - no local GPU needed!
 Works 24/7 even when your laptop is off.
 """
 import os
+import json
+import shutil
+import hashlib
+import threading
+import importlib.util
 import requests
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from functools import lru_cache
+from requests.adapters import HTTPAdapter
 import time
 import base64
 import tempfile
@@ -17,6 +25,80 @@ HF_VIDEO_MODELS = {
     "zeroscope": "cerspense/zeroscope_v2_576w",  # Better quality, slower
 }
 
+# Per-request timeout, and the total time a generation may spend waiting
+# for a cold model (503s) before giving up
+REQUEST_TIMEOUT_S = 300
+COLD_START_BUDGET_S = 300
+
+# How long an is_available() answer is reused
+AVAILABILITY_TTL_S = 60
+
+# Longest a caller waits on an identical in-flight request (cold start
+# budget plus one full request)
+INFLIGHT_WAIT_S = COLD_START_BUDGET_S + REQUEST_TIMEOUT_S
+
+# Generated videos are kept under outputs/.cache, keyed by request hash, and
+# the least recently used are evicted above AIVG_HF_CACHE_GB (default 20)
+OUTPUT_DIR = os.path.join(os.path.dirname(__file__), "..", "outputs")
+CACHE_DIR = os.path.join(OUTPUT_DIR, ".cache")
+CACHE_MAX_BYTES = int(float(os.getenv("AIVG_HF_CACHE_GB", "20")) * (1 << 30))
+
+
+def _link_or_copy(src: str, dst: str):
+    """Hard-link src to dst (no bytes copied), copying where links are unsupported."""
+    try:
+        os.link(src, dst)
+    except FileExistsError:
+        pass
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def _evict_cache(max_bytes: int = CACHE_MAX_BYTES):
+    """Delete least recently used cache entries until the cache fits max_bytes."""
+    with os.scandir(CACHE_DIR) as it:
+        entries = [(e.stat().st_mtime, e.stat().st_size, e.path) for e in it if e.name.endswith(".mp4")]
+    total = sum(size for _, size, _ in entries)
+    # Oldest access first (hits refresh mtime)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+
+
+@lru_cache(maxsize=1)
+def _discover_token() -> Optional[str]:
+    """Find the HuggingFace token (resolved only once per process)."""
+    # Try Streamlit secrets first (without importing Streamlit outside the app)
+    if importlib.util.find_spec("streamlit") is not None:
+        try:
+            import streamlit as st
+            if hasattr(st, 'secrets') and 'HF_TOKEN' in st.secrets:
+                return st.secrets['HF_TOKEN']
+        except:
+            pass
+    
+    # Try environment variable
+    token = os.getenv("HF_TOKEN") or os.getenv("HUGGINGFACE_TOKEN")
+    if token:
+        return token
+        
+    # Try .env file
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+        token = os.getenv("HF_TOKEN")
+        if token:
+            return token
+    except:
+        pass
+        
+    return None
+
 
 class HuggingFaceVideoGenerator:
     """Generate videos using HuggingFace's Inference API (runs on their servers)."""
@@ -27,32 +109,21 @@ class HuggingFaceVideoGenerator:
         self.api_url = f"{HF_API_URL}{self.model_id}"
         self.hf_token = self._get_token()
         
-    def _get_token(self) -> Optional[str]:
-        """Get HuggingFace token from various sources."""
-        # Try Streamlit secrets first
-        try:
-            import streamlit as st
-            if hasattr(st, 'secrets') and 'HF_TOKEN' in st.secrets:
-                return st.secrets['HF_TOKEN']
-        except:
-            pass
+        # Keep-alive session: the cold-start retries and later generations
+        # reuse the TLS connection instead of handshaking every request.
+        # Retries stay with _post_until_loaded.
+        self._session = requests.Session()
+        self._session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=0))
+        self._avail_cache = None  # (time.monotonic() of the check, result)
         
-        # Try environment variable
-        token = os.getenv("HF_TOKEN") or os.getenv("HUGGINGFACE_TOKEN")
-        if token:
-            return token
-            
-        # Try .env file
-        try:
-            from dotenv import load_dotenv
-            load_dotenv()
-            token = os.getenv("HF_TOKEN")
-            if token:
-                return token
-        except:
-            pass
-            
-        return None
+        # Generations in flight, keyed by request hash, so identical
+        # concurrent requests share one API call
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        
+    def _get_token(self) -> Optional[str]:
+        """Get HuggingFace token from Streamlit secrets, the environment or .env."""
+        return _discover_token()
     
     def _get_headers(self) -> dict:
         """Get API headers with authorization."""
@@ -70,11 +141,17 @@ class HuggingFaceVideoGenerator:
         width: int = 256,
         negative_prompt: str = "",
         progress_callback: Optional[Callable] = None,
+        use_cache: bool = True,
         **kwargs
     ) -> Optional[str]:
         """
         Generate a video using HuggingFace Inference API.
         
+        Args:
+            use_cache: Reuse a cached or in-flight video for the same request;
+                False always runs a new generation (e.g. to regenerate),
+                which then replaces the cached one
+        
         Returns:
             Path to saved video file, or None if failed.
         """
@@ -95,43 +172,94 @@ class HuggingFaceVideoGenerator:
         if negative_prompt:
             payload["parameters"]["negative_prompt"] = negative_prompt
         
+        key = hashlib.blake2b(
+            json.dumps({"model": self.model_id, "payload": payload}, sort_keys=True).encode("utf-8"),
+            digest_size=16
+        ).hexdigest()
+        
+        # Same request generated before: hand out a new link to that file
+        cache_path = os.path.join(CACHE_DIR, f"{key}.mp4")
+        if use_cache and os.path.exists(cache_path):
+            output_path = self._output_path(key)
+            try:
+                _link_or_copy(cache_path, output_path)
+                os.utime(cache_path)  # mark as recently used
+                if progress_callback:
+                    progress_callback("Same video generated before, reusing it!")
+                return output_path
+            except OSError as e:
+                print(f"⚠️ Video cache read failed: {e}")
+        
+        if not use_cache:
+            # Fresh video wanted: do not join an identical request either
+            output_path = self._generate(payload, self._output_path(key), progress_callback)
+            if output_path:
+                self._store_in_cache(output_path, cache_path)
+            return output_path
+        
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+        
+        if not owner:
+            # Same request already running (e.g. another session): share it
+            if progress_callback:
+                progress_callback("Identical request already running, waiting for it...")
+            try:
+                return future.result(timeout=INFLIGHT_WAIT_S)
+            except FutureTimeoutError:
+                print("❌ Timed out waiting for an identical HuggingFace request")
+                return None
+        
+        try:
+            output_path = self._generate(payload, self._output_path(key), progress_callback)
+            if output_path:
+                self._store_in_cache(output_path, cache_path)
+            future.set_result(output_path)
+            return output_path
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        except BaseException:
+            # Control flow of the owner's thread (e.g. Streamlit's rerun/stop
+            # raised from its progress callback) must not be re-raised in
+            # other sessions; waiters just get no video
+            future.set_result(None)
+            raise
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
+    
+    @staticmethod
+    def _output_path(key: str) -> str:
+        """Get a fresh path in the outputs folder for a video of request `key`."""
+        os.makedirs(OUTPUT_DIR, exist_ok=True)
+        timestamp = int(time.time())
+        return os.path.join(OUTPUT_DIR, f"hf_video_{timestamp}_{key[:8]}.mp4")
+    
+    @staticmethod
+    def _store_in_cache(output_path: str, cache_path: str):
+        """Link a generated video into the cache, then evict down to the size cap."""
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            # Link under a temporary name and rename over any older entry,
+            # so a regenerated video replaces the cached one atomically
+            tmp_path = f"{cache_path}.{threading.get_ident()}.tmp"
+            _link_or_copy(output_path, tmp_path)
+            os.replace(tmp_path, cache_path)
+            _evict_cache()
+        except OSError as e:
+            print(f"⚠️ Video cache write failed: {e}")
+    
+    def _generate(self, payload: dict, output_path: str, progress_callback: Optional[Callable] = None) -> Optional[str]:
+        """Run one API generation and save the video to output_path (None if failed)."""
         try:
             if progress_callback:
                 progress_callback("Sending request to HuggingFace API...")
             
-            # Make API request
-            response = requests.post(
-                self.api_url,
-                headers=self._get_headers(),
-                json=payload,
-                timeout=300  # 5 minute timeout for video generation
-            )
-            
-            # Handle model loading (503 = model is cold starting)
-            retry_count = 0
-            max_retries = 30  # 30 * 10s = 5 minutes max wait
-            
-            while response.status_code == 503 and retry_count < max_retries:
-                retry_count += 1
-                wait_time = 10
-                
-                try:
-                    error_data = response.json()
-                    if "estimated_time" in error_data:
-                        wait_time = min(error_data["estimated_time"], 30)
-                except:
-                    pass
-                
-                if progress_callback:
-                    progress_callback(f"Model loading on HuggingFace servers... (retry {retry_count}/{max_retries})")
-                
-                time.sleep(wait_time)
-                response = requests.post(
-                    self.api_url,
-                    headers=self._get_headers(),
-                    json=payload,
-                    timeout=300
-                )
+            response = self._post_until_loaded(payload, progress_callback)
             
             # Check for errors
             if response.status_code != 200:
@@ -149,20 +277,23 @@ class HuggingFaceVideoGenerator:
             if progress_callback:
                 progress_callback("Video generated! Saving...")
             
-            # Save the video
-            video_data = response.content
-            
-            # Create output directory
-            output_dir = os.path.join(os.path.dirname(__file__), "..", "outputs")
-            os.makedirs(output_dir, exist_ok=True)
-            
-            # Generate filename
-            timestamp = int(time.time())
-            filename = f"hf_video_{timestamp}.mp4"
-            output_path = os.path.join(output_dir, filename)
-            
-            with open(output_path, "wb") as f:
-                f.write(video_data)
+            # Stream the video to disk as it arrives instead of holding the
+            # whole MP4 in memory; the .part file keeps a broken download
+            # from looking like a finished video
+            part_path = output_path + ".part"
+            try:
+                with open(part_path, "wb") as f:
+                    for chunk in response.iter_content(chunk_size=1 << 20):
+                        f.write(chunk)
+                os.replace(part_path, output_path)
+            except BaseException:
+                try:
+                    os.remove(part_path)
+                except OSError:
+                    pass
+                raise
+            finally:
+                response.close()
             
             if progress_callback:
                 progress_callback("Video saved successfully!")
@@ -179,17 +310,94 @@ class HuggingFaceVideoGenerator:
             print(f"❌ Unexpected error: {e}")
             return None
     
+    def _post_until_loaded(self, payload: dict, progress_callback: Optional[Callable] = None):
+        """
+        POST the payload, retrying while the model is cold starting (503).
+        
+        Waits follow the API's estimated_time (10-30 s), and all retries
+        share one COLD_START_BUDGET_S deadline, so a cold model can not hold
+        the calling thread for 30 full request timeouts.
+        
+        Returns:
+            The last response, with its body not yet read (stream=True)
+        """
+        deadline = time.monotonic() + COLD_START_BUDGET_S
+        retry_count = 0
+        
+        while True:
+            # Make API request
+            response = self._session.post(
+                self.api_url,
+                headers=self._get_headers(),
+                json=payload,
+                timeout=REQUEST_TIMEOUT_S,
+                stream=True
+            )
+            
+            # Handle model loading (503 = model is cold starting)
+            if response.status_code != 503:
+                return response
+            
+            wait_time = 10
+            try:
+                error_data = response.json()
+                if "estimated_time" in error_data:
+                    wait_time = min(error_data["estimated_time"], 30)
+            except:
+                pass
+            finally:
+                response.close()
+            
+            remaining = deadline - time.monotonic()
+            if remaining <= wait_time:
+                return response
+            
+            retry_count += 1
+            if progress_callback:
+                progress_callback(f"Model loading on HuggingFace servers... (retry {retry_count}, up to {int(remaining)}s left)")
+            
+            time.sleep(wait_time)
+    
+    def warmup(self):
+        """
+        Send a minimal generation request so HF starts loading the model.
+        
+        The response is discarded; a 503 here means the load has started,
+        so the first real generation skips most of the cold-start wait.
+        """
+        payload = {
+            "inputs": "warmup",
+            "parameters": {"num_frames": 8, "num_inference_steps": 1, "height": 128, "width": 128}
+        }
+        try:
+            response = self._session.post(
+                self.api_url,
+                headers=self._get_headers(),
+                json=payload,
+                timeout=30,
+                stream=True
+            )
+            response.close()
+        except requests.exceptions.RequestException as e:
+            print(f"⚠️ HuggingFace warm-up skipped: {e}")
+    
     def is_available(self) -> bool:
-        """Check if the API is available and model is loaded."""
+        """Check if the API is available and model is loaded (cached for AVAILABILITY_TTL_S)."""
+        if self._avail_cache and time.monotonic() - self._avail_cache[0] < AVAILABILITY_TTL_S:
+            return self._avail_cache[1]
+        
         try:
-            response = requests.get(
+            response = self._session.get(
                 f"https://api-inference.huggingface.co/status/{self.model_id}",
                 headers=self._get_headers(),
-                timeout=10
+                timeout=5
             )
-            return response.status_code == 200
+            available = response.status_code == 200
         except:
-            return False
+            available = False
+        
+        self._avail_cache = (time.monotonic(), available)
+        return available
 
 
 # Singleton instance
@@ -207,7 +415,8 @@ def get_hf_generator(model_key: str = "damo-text-to-video") -> HuggingFaceVideoG
 def generate_video_hf(
     prompt: str,
     settings: dict,
-    progress_callback: Optional[Callable] = None
+    progress_callback: Optional[Callable] = None,
+    use_cache: bool = True
 ) -> Optional[str]:
     """
     High-level function to generate video via HuggingFace API.
@@ -216,6 +425,8 @@ def generate_video_hf(
         prompt: Text description of the video
         settings: Dictionary with generation settings
         progress_callback: Optional callback for progress updates
+        use_cache: Reuse the video of an identical earlier request; pass
+            False to regenerate
         
     Returns:
         Path to generated video file, or None if failed
@@ -245,5 +456,6 @@ def generate_video_hf(
         height=min(settings.get("height", 256), 512),  # API limit
         width=min(settings.get("width", 256), 512),    # API limit
         negative_prompt=negative_prompt,
-        progress_callback=progress_callback
+        progress_callback=progress_callback,
+        use_cache=use_cache
     )
@@ -1,8 +1,85 @@
-import os
+import re
 import json
+import time
 from typing import Dict, List, Optional
 from huggingface_hub import InferenceClient
-from . import HF_TOKEN
+from . import get_hf_token
+
+# Responses are parsed with orjson when it is installed
+try:
+    import orjson
+    def _dumps(obj) -> str:
+        return orjson.dumps(obj).decode("utf-8")
+    _loads = orjson.loads
+except ImportError:
+    _dumps = json.dumps
+    _loads = json.loads
+
+# After the primary model fails, calls go straight to the fallback for this long
+PRIMARY_COOLDOWN_S = 30
+
+# Braces, and whole string literals so braces inside strings are skipped
+_JSON_TOKEN = re.compile(r'"(?:[^"\\]|\\.)*"|[{}]', re.DOTALL)
+
+
+def _extract_json(text: str) -> Dict:
+    """
+    Parse the first complete JSON object in an LLM response.
+    
+    A single pass tracks brace depth from the first "{", so prose before
+    or after the object (including other braces) is ignored.
+    
+    Raises:
+        ValueError: If the response holds no complete object
+    """
+    start = text.find("{")
+    if start != -1:
+        depth = 0
+        for match in _JSON_TOKEN.finditer(text, start):
+            token = match.group()
+            if token == "{":
+                depth += 1
+            elif token == "}":
+                depth -= 1
+                if depth == 0:
+                    return _loads(text[start:match.end()])
+    raise ValueError("No JSON found")
+
+
+class _JsonEndScanner:
+    """Finds, chunk by chunk, where the first top-level JSON object in a stream closes."""
+    __slots__ = ("depth", "in_string", "escaped")
+    
+    def __init__(self):
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+    
+    def feed(self, text: str) -> bool:
+        """Scan the next chunk; True once the first object is complete."""
+        for ch in text:
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif ch == "\\":
+                    self.escaped = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == "{":
+                self.depth += 1
+            elif self.depth:
+                if ch == '"':
+                    self.in_string = True
+                elif ch == "}":
+                    self.depth -= 1
+                    if self.depth == 0:
+                        return True
+        return False
+
+
+def is_default_result(result: Dict) -> bool:
+    """True if an analyze_prompt()/generate_video_prompt() result is the API-failure default."""
+    return "error" in result
 
 
 class LlamaPromptGenerator:    
@@ -12,21 +89,88 @@ class LlamaPromptGenerator:
         self.model_id = "meta-llama/Llama-4-Scout-17B-16E-Instruct"
         # Fallback model if Scout not available
         self.fallback_model = "meta-llama/Llama-3.3-70B-Instruct"
+        # time.monotonic() until which the primary is treated as down
+        self._primary_bad_until = 0.0
         
     def _get_client(self):
     
         if self.client is None:
-            token = HF_TOKEN or os.getenv("HF_TOKEN")
+            token = get_hf_token()
             if not token:
                 raise ValueError("HuggingFace token not set. Set HF_TOKEN environment variable.")
             self.client = InferenceClient(token=token)
         return self.client
     
+    def _chat(self, messages: List[Dict], max_tokens: int, temperature: float, stream: bool = False):
+        """
+        Run a chat completion on the primary model, or the fallback while it is down.
+        
+        A primary failure marks it down for PRIMARY_COOLDOWN_S, so calls in
+        that window skip the failing (often timing out) primary request.
+        """
+        client = self._get_client()
+        if time.monotonic() >= self._primary_bad_until:
+            try:
+                return client.chat_completion(
+                    model=self.model_id,
+                    messages=messages,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    stream=stream
+                )
+            except Exception:
+                self._primary_bad_until = time.monotonic() + PRIMARY_COOLDOWN_S
+        
+        return client.chat_completion(
+            model=self.fallback_model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=stream
+        )
+    
+    def _chat_json(self, messages: List[Dict], max_tokens: int, temperature: float) -> str:
+        """
+        Stream a chat completion and stop as soon as its first JSON object closes.
+        
+        Generation time scales with tokens produced, so cutting the stream
+        at the closing brace skips any trailing text the model would add.
+        Without a complete object the full completion (up to max_tokens) is read.
+        
+        Returns:
+            The response text received
+        """
+        stream = self._chat(messages, max_tokens, temperature, stream=True)
+        scanner = _JsonEndScanner()
+        parts = []
+        try:
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    parts.append(delta)
+                    if scanner.feed(delta):
+                        break
+        finally:
+            # Drops the HTTP stream so the server stops generating
+            stream.close()
+        return "".join(parts)
+    
+    def warmup(self):
+        """Build the client and send a 1-token request so the first real call is warm."""
+        try:
+            self._chat([{"role": "user", "content": "ok"}], max_tokens=1, temperature=0.0)
+        except Exception as e:
+            print(f"LLAMA warm-up skipped: {e}")
+    
     def analyze_prompt(
         self, 
         text: str,
         progress_callback=None
     ) -> Dict:
+        """
+        Analyze a user prompt to extract intent, topic and emotions.
         
         Args:
             text: User input prompt
@@ -39,8 +183,6 @@ class LlamaPromptGenerator:
             if progress_callback:
                 progress_callback("Analyzing prompt with LLAMA 4 Scout...")
             
-            client = self._get_client()
-            
             system_prompt = """You are an expert at analyzing video generation prompts. 
 Analyze the user's request and extract structured information.
 Always respond with valid JSON only."""
@@ -62,35 +204,11 @@ Respond with ONLY valid JSON:"""
                 {"role": "user", "content": user_message}
             ]
             
-            # Try primary model first
-            try:
-                response = client.chat_completion(
-                    model=self.model_id,
-                    messages=messages,
-                    max_tokens=500,
-                    temperature=0.3
-                )
-            except Exception:
-                # Fallback to alternative model
-                response = client.chat_completion(
-                    model=self.fallback_model,
-                    messages=messages,
-                    max_tokens=500,
-                    temperature=0.3
-                )
-            
-            response_text = response.choices[0].message.content.strip()
+            response_text = self._chat_json(messages, max_tokens=500, temperature=0.3).strip()
             
             # Parse JSON from response
             try:
-                # Find JSON in response
-                start = response_text.find("{")
-                end = response_text.rfind("}") + 1
-                if start != -1 and end > start:
-                    json_str = response_text[start:end]
-                    analysis = json.loads(json_str)
-                else:
-                    raise ValueError("No JSON found")
+                analysis = _extract_json(response_text)
             except json.JSONDecodeError:
                 analysis = self._default_analysis(text)
             
@@ -136,8 +254,6 @@ Respond with ONLY valid JSON:"""
             if progress_callback:
                 progress_callback("Generating enhanced video prompt...")
             
-            client = self._get_client()
-            
             system_prompt = """You are an expert at creating detailed prompts for AI video generation.
 Create rich, visual descriptions that will produce high-quality videos.
 Always respond with valid JSON only."""
@@ -145,7 +261,7 @@ Always respond with valid JSON only."""
             user_message = f"""Based on this analysis and original prompt, create an enhanced video generation configuration:
 
 Original prompt: "{original_prompt}"
-Analysis: {json.dumps(analysis)}
+Analysis: {_dumps(analysis)}
 
 Create a JSON with:
 - prompt: A detailed, visual description for the video (2-3 sentences, rich in visual detail)
@@ -164,32 +280,11 @@ Respond with ONLY valid JSON:"""
                 {"role": "user", "content": user_message}
             ]
             
-            try:
-                response = client.chat_completion(
-                    model=self.model_id,
-                    messages=messages,
-                    max_tokens=600,
-                    temperature=0.5
-                )
-            except Exception:
-                response = client.chat_completion(
-                    model=self.fallback_model,
-                    messages=messages,
-                    max_tokens=600,
-                    temperature=0.5
-                )
-            
-            response_text = response.choices[0].message.content.strip()
+            response_text = self._chat_json(messages, max_tokens=600, temperature=0.5).strip()
             
             # Parse JSON
             try:
-                start = response_text.find("{")
-                end = response_text.rfind("}") + 1
-                if start != -1 and end > start:
-                    json_str = response_text[start:end]
-                    config = json.loads(json_str)
-                else:
-                    raise ValueError("No JSON found")
+                config = _extract_json(response_text)
             except json.JSONDecodeError:
                 config = self._default_config(original_prompt, analysis)
             
@@ -212,8 +307,39 @@ Respond with ONLY valid JSON:"""
             "duration_seconds": 4,
             "camera_motion": analysis.get("motion", "smooth"),
             "lighting": "natural",
-            "color_palette": "balanced"
+            "color_palette": "balanced",
+            "error": "Using default config"
         }
+    
+    def enhance_prompt(self, text: str, progress_callback=None) -> tuple:
+        """
+        Run analyze_prompt() and then generate_video_prompt() for one prompt.
+        
+        Returns:
+            (analysis, config) tuple
+        """
+        analysis = self.analyze_prompt(text, progress_callback=progress_callback)
+        return analysis, self.generate_video_prompt(analysis, text, progress_callback=progress_callback)
+    
+    def batch_enhance(self, prompts: List[str], max_workers: int = 4) -> List[tuple]:
+        """
+        Enhance several independent prompts (e.g. the scenes of a script) concurrently.
+        
+        Each prompt's two LLM calls stay sequential, but different prompts
+        overlap, so N prompts take about one prompt's round trips rather than N.
+        
+        Args:
+            prompts: User prompts to enhance
+            max_workers: Prompts in flight at once (keeps within HF rate limits)
+            
+        Returns:
+            List of (analysis, config) tuples, in the order of `prompts`
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        
+        self._get_client()  # create the shared client before the threads start
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            return list(pool.map(self.enhance_prompt, prompts))
 
 
 # Singleton instance
@@ -1,12 +1,13 @@
 """
 ModelScope text-to-video model integration.
 """
+import os
 import torch
 import warnings
 import logging
 from diffusers import DiffusionPipeline
 from diffusers.utils import export_to_video
-from . import HF_TOKEN, DEVICE, DTYPE
+from . import HF_TOKEN, DEVICE, DTYPE, AVAILABLE_MODELS, resolve_dtype, mixed_precision
 
 # Suppress harmless model loading warnings
 warnings.filterwarnings("ignore", message=".*position_ids.*")
@@ -14,6 +15,12 @@ warnings.filterwarnings("ignore", message=".*UNEXPECTED.*")
 warnings.filterwarnings("ignore", message=".*TextToVideoSDPipeline.*")
 logging.getLogger("transformers").setLevel(logging.ERROR)
 
+# Low-VRAM mode offloads whole components (one transfer each per call) on
+# GPUs with at least this much memory; smaller cards need sequential offload,
+# which moves every submodule per forward pass. 8 GB cards report slightly
+# under 8 GiB, hence 7.5.
+MODEL_OFFLOAD_MIN_VRAM = int(7.5 * (1 << 30))
+
 
 class ModelScopeGenerator:
     """ModelScope text-to-video generator."""
@@ -23,12 +30,19 @@ class ModelScopeGenerator:
     NEGATIVE_PROMPT = "blurry, low quality, distorted, pixelated, ugly, bad anatomy, deformed, noisy, grainy"
     
     # Default model (DAMO - works offline, already downloaded)
-    DEFAULT_MODEL = "damo-vilab/text-to-video-ms-1.7b"
+    DEFAULT_MODEL = AVAILABLE_MODELS["modelscope"].repo
     
-    def __init__(self, model_id: str = None):
+    def __init__(self, model_id: str = None, use_compile: bool = None):
         self.pipeline = None
         self.model_id = model_id or self.DEFAULT_MODEL
         self.current_model_id = None  # Track loaded model
+        # torch.compile the UNet on load. Opt-in (use_compile=True or
+        # AIVG_COMPILE=1): it needs a working Triton toolchain, compile
+        # errors only surface in the first generation, and every new
+        # resolution or frame count recompiles for minutes
+        if use_compile is None:
+            use_compile = os.environ.get("AIVG_COMPILE", "0") == "1"
+        self.use_compile = use_compile and DEVICE == "cuda" and hasattr(torch, "compile")
     
     def set_model(self, model_id: str):
         """Change model (requires reload)."""
@@ -53,11 +67,27 @@ class ModelScopeGenerator:
             if progress_callback:
                 progress_callback(f"Loading {model_name}...")
             
-            self.pipeline = DiffusionPipeline.from_pretrained(
-                self.model_id,
-                torch_dtype=DTYPE,
-                token=HF_TOKEN
-            )
+            # Honour the registered model's dtype contract when we know it
+            spec = next((s for s in AVAILABLE_MODELS.values() if s.repo == self.model_id), None)
+            dtype = resolve_dtype(spec) if spec else DTYPE
+            
+            # fp16 checkpoints halve the download and skip the fp32->fp16 cast
+            try:
+                self.pipeline = DiffusionPipeline.from_pretrained(
+                    self.model_id,
+                    torch_dtype=dtype,
+                    variant="fp16" if dtype == torch.float16 else None,
+                    token=HF_TOKEN
+                )
+            except (OSError, ValueError):
+                # Repo has no fp16 variant; cast the full-precision weights
+                self.pipeline = DiffusionPipeline.from_pretrained(
+                    self.model_id,
+                    torch_dtype=dtype,
+                    token=HF_TOKEN
+                )
+            
+            quantized = low_vram and self._quantize_unet(progress_callback)
             
             try:
                 # Memory optimizations
@@ -71,11 +101,19 @@ class ModelScopeGenerator:
                             raise RuntimeError("GPU_UNSUPPORTED")
                         raise e
                         
-                    if low_vram:
+                    total_vram = torch.cuda.get_device_properties(0).total_memory
+                    sequential = low_vram and total_vram < MODEL_OFFLOAD_MIN_VRAM
+                    if sequential:
                         self.pipeline.enable_sequential_cpu_offload()
                     else:
                         self.pipeline.enable_model_cpu_offload()
                     self.pipeline.enable_vae_slicing()
+                    self._enable_memory_efficient_attention(low_vram)
+                    
+                    # Per-submodule offload hooks and int8 weights break
+                    # the compiled graph, so only compile a plain UNet
+                    if self.use_compile and not sequential and not quantized:
+                        self._compile_unet(progress_callback)
                 else:
                     self.pipeline = self.pipeline.to(DEVICE)
                     
@@ -100,6 +138,67 @@ class ModelScopeGenerator:
         
         return self.pipeline
     
+    def _quantize_unet(self, progress_callback=None) -> bool:
+        """
+        Quantize the UNet weights to int8 with optimum-quanto, if installed.
+        
+        Halves the UNet's footprint for low-VRAM mode. Must run before CPU
+        offload hooks are attached. Skipped silently without optimum-quanto.
+        
+        Returns:
+            True if the UNet was quantized
+        """
+        try:
+            from optimum.quanto import freeze, qint8, quantize
+        except ImportError:
+            return False
+        
+        if progress_callback:
+            progress_callback("Quantizing UNet to int8...")
+        try:
+            quantize(self.pipeline.unet, weights=qint8)
+            freeze(self.pipeline.unet)
+            return True
+        except Exception as e:
+            print(f"⚠️ UNet int8 quantization skipped: {e}")
+            return False
+    
+    def _compile_unet(self, progress_callback=None):
+        """
+        Compile the UNet with torch.compile to fuse point-wise ops.
+        
+        The UNet runs once or twice per denoising step, so removing the
+        per-op Python dispatch adds up over a 40-step schedule. Compilation
+        happens on the first generation. Offload moves the weights between
+        calls, which CUDA graphs cannot follow, so the default mode is used
+        rather than "reduce-overhead".
+        """
+        if progress_callback:
+            progress_callback("Compiling UNet (first generation will be slower)...")
+        try:
+            self.pipeline.unet = torch.compile(self.pipeline.unet, fullgraph=False)
+        except Exception as e:
+            print(f"⚠️ UNet compile skipped: {e}")
+    
+    def _enable_memory_efficient_attention(self, low_vram: bool):
+        """
+        Use xFormers attention when installed, else PyTorch SDPA.
+        
+        Both compute attention in tiles without materialising the full
+        score matrix. diffusers already defaults to SDPA on torch 2.x, and
+        attention slicing would replace it, so slicing is only used as the
+        low-VRAM fallback on older torch.
+        """
+        try:
+            import xformers  # noqa: F401
+            self.pipeline.enable_xformers_memory_efficient_attention()
+            return
+        except Exception:
+            pass
+        
+        if low_vram and not hasattr(torch.nn.functional, "scaled_dot_product_attention"):
+            self.pipeline.enable_attention_slicing()
+    
     def generate(
         self,
         prompt: str,
@@ -111,6 +210,8 @@ class ModelScopeGenerator:
         low_vram: bool = True,
         negative_prompt: str = None,    # NEW: negative prompt support
         enhance_prompt: bool = True,    # NEW: auto-enhance prompt
+        as_tensor: bool = False,
+        vae_tiling: bool = True,
         progress_callback=None
     ):
         """
@@ -123,7 +224,11 @@ class ModelScopeGenerator:
             guidance_scale: Prompt guidance strength
             height: Video height
             width: Video width
-            low_vram: Use specific sequential offloading
+            low_vram: Offload to CPU, per submodule on GPUs under 8 GB
+            as_tensor: Return a (frames, C, H, W) float tensor in [0, 1] on
+                DEVICE instead of numpy frames, for on-GPU post-processing
+            vae_tiling: Decode latents in overlapping tiles to bound VAE
+                memory at high resolutions
             progress_callback: Optional progress callback
         
         Returns:
@@ -131,6 +236,12 @@ class ModelScopeGenerator:
         """
         pipeline = self.load_model(low_vram, progress_callback)
         
+        # Cheap flag flip on the loaded VAE, so it can change per call
+        if vae_tiling:
+            pipeline.vae.enable_tiling()
+        else:
+            pipeline.vae.disable_tiling()
+        
         # Enhance prompt for better quality
         enhanced_prompt = prompt
         if enhance_prompt:
@@ -143,17 +254,21 @@ class ModelScopeGenerator:
             progress_callback(f"Generating {num_frames} frames at {width}x{height}...")
         
         # Generate video with quality settings
-        result = pipeline(
-            prompt=enhanced_prompt,
-            negative_prompt=neg_prompt,
-            num_frames=num_frames,
-            num_inference_steps=num_inference_steps,
-            guidance_scale=guidance_scale,
-            height=height,
-            width=width,
-        )
+        with mixed_precision(dtype=pipeline.dtype):
+            result = pipeline(
+                prompt=enhanced_prompt,
+                negative_prompt=neg_prompt,
+                num_frames=num_frames,
+                num_inference_steps=num_inference_steps,
+                guidance_scale=guidance_scale,
+                height=height,
+                width=width,
+                output_type="pt" if as_tensor else "np",
+            )
         
         video_frames = result.frames[0]
+        if as_tensor:
+            video_frames = video_frames.to(DEVICE)
         
         if progress_callback:
             progress_callback("Video generation complete!")
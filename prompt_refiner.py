@@ -1,7 +1,6 @@
 import os
-import torch
 from transformers import AutoModelForCausalLM, AutoTokenizer
-from . import HF_TOKEN, DEVICE, DTYPE
+from . import HF_TOKEN, DEVICE, DTYPE, inference
 
 class PromptRefiner:
     """LLM-based prompt refinement for video generation."""
@@ -98,7 +97,7 @@ Enhance this prompt with more visual details for AI video generation. Return ONL
         
         inputs = tokenizer(input_text, return_tensors="pt").to(self.model.device)
         
-        with torch.no_grad():
+        with inference():
             outputs = self.model.generate(
                 **inputs,
                 max_new_tokens=150,
@@ -171,7 +170,7 @@ Return ONLY the JSON object."""
         input_text = tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
         inputs = tokenizer(input_text, return_tensors="pt").to(self.model.device)
         
-        with torch.no_grad():
+        with inference():
             outputs = self.model.generate(
                 **inputs,
                 max_new_tokens=300,
@@ -248,7 +247,7 @@ Return only the numbered list of prompts, one per line."""
         
         inputs = tokenizer(input_text, return_tensors="pt").to(self.model.device)
         
-        with torch.no_grad():
+        with inference():
             outputs = self.model.generate(
                 **inputs,
                 max_new_tokens=300,
@@ -2,9 +2,9 @@
 Subtitle generator using Google TranslateGemma model.
 Automatically generates contextual subtitles for video content.
 """
-import os
 from typing import List, Optional
 import torch
+from . import DEVICE, inference, get_hf_token
 
 
 class TranslateGemmaSubtitleGenerator:
@@ -14,7 +14,7 @@ class TranslateGemmaSubtitleGenerator:
         self.model = None
         self.tokenizer = None
         self.model_id = "google/translategemma-4b"  # 4B variant for efficiency
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.device = "cuda" if DEVICE == "cuda" else "cpu"
         self.loaded = False
     
     def load_model(self, progress_callback=None):
@@ -31,14 +31,14 @@ class TranslateGemmaSubtitleGenerator:
             # Load tokenizer
             self.tokenizer = AutoTokenizer.from_pretrained(
                 self.model_id,
-                token=os.getenv("HF_TOKEN", ""),
+                token=get_hf_token(),
                 trust_remote_code=True
             )
             
             # Load model with appropriate settings
             self.model = AutoModelForCausalLM.from_pretrained(
                 self.model_id,
-                token=os.getenv("HF_TOKEN", ""),
+                token=get_hf_token(),
                 torch_dtype=torch.float16 if self.device == "cuda" else torch.float32,
                 device_map="auto" if self.device == "cuda" else None,
                 trust_remote_code=True,
@@ -65,7 +65,8 @@ class TranslateGemmaSubtitleGenerator:
         prompt: str,
         duration_seconds: float = 4.0,
         language: str = "en",
-        progress_callback=None
+        progress_callback=None,
+        with_source: bool = False
     ) -> List[dict]:
         """
         Generate contextual subtitles for a video based on the prompt.
@@ -75,9 +76,12 @@ class TranslateGemmaSubtitleGenerator:
             duration_seconds: Total video duration
             language: Target language code
             progress_callback: Optional progress callback
+            with_source: Also report whether the model wrote the subtitles
         
         Returns:
-            List of subtitle segments with timing
+            List of subtitle segments with timing, or a (segments, from_model)
+            tuple with with_source; from_model is False for the word-split
+            fallback (no model, a model error or unparseable output)
         """
         if progress_callback:
             progress_callback("Generating subtitles...")
@@ -87,9 +91,10 @@ class TranslateGemmaSubtitleGenerator:
             self.load_model(progress_callback)
         
         if self.model and self.tokenizer:
-            return self._generate_with_model(prompt, duration_seconds, language, progress_callback)
+            subtitles, from_model = self._generate_with_model(prompt, duration_seconds, language, progress_callback)
         else:
-            return self._generate_fallback(prompt, duration_seconds, progress_callback)
+            subtitles, from_model = self._generate_fallback(prompt, duration_seconds, progress_callback), False
+        return (subtitles, from_model) if with_source else subtitles
             
 
     
@@ -99,8 +104,8 @@ class TranslateGemmaSubtitleGenerator:
         duration_seconds: float,
         language: str,
         progress_callback=None
-    ) -> List[dict]:
-        """Generate subtitles using TranslateGemma model."""
+    ) -> tuple:
+        """Generate subtitles using TranslateGemma model, as (segments, from_model)."""
         from utils import clean_memory
         clean_memory()
         
@@ -131,7 +136,7 @@ Example:
         try:
             inputs = self.tokenizer(system_prompt, return_tensors="pt").to(self.device)
             
-            with torch.no_grad():
+            with inference():
                 outputs = self.model.generate(
                     **inputs,
                     max_new_tokens=200,
@@ -143,12 +148,16 @@ Example:
             response = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
             
             # Parse the response into subtitle segments
-            return self._parse_subtitle_response(response, duration_seconds)
+            subtitles = self._parse_subtitle_response(response, duration_seconds)
+            if subtitles:
+                return subtitles, True
+            # If parsing failed, use fallback
+            return self._generate_fallback(response.split("description:")[-1], duration_seconds, None), False
             
         except Exception as e:
             if progress_callback:
                 progress_callback(f"Fallback mode: {str(e)[:30]}")
-            return self._generate_fallback(prompt, duration_seconds, progress_callback)
+            return self._generate_fallback(prompt, duration_seconds, progress_callback), False
     
     def _generate_fallback(
         self,
@@ -196,7 +205,7 @@ Example:
         response: str,
         duration_seconds: float
     ) -> List[dict]:
-        """Parse model response into subtitle segments."""
+        """Parse model response into subtitle segments (empty if none parse)."""
         import re
         
         subtitles = []
@@ -219,10 +228,6 @@ Example:
                         "text": text
                     })
         
-        # If parsing failed, use fallback
-        if not subtitles:
-            return self._generate_fallback(response.split("description:")[-1], duration_seconds, None)
-        
         return subtitles
 
 
@@ -241,13 +246,15 @@ def generate_video_subtitles(
     prompt: str,
     duration_seconds: float = 4.0,
     language: str = "en",
-    progress_callback=None
+    progress_callback=None,
+    with_source: bool = False
 ) -> List[dict]:
     """
     Convenience function to generate subtitles for a video.
     
     Returns list of subtitle segments like:
     [{"start": 0.0, "end": 2.0, "text": "A beautiful sunset..."}, ...]
+    or a (segments, from_model) tuple with with_source (see generate_subtitles).
     """
     generator = get_subtitle_generator()
-    return generator.generate_subtitles(prompt, duration_seconds, language, progress_callback)
+    return generator.generate_subtitles(prompt, duration_seconds, language, progress_callback, with_source)
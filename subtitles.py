@@ -6,6 +6,14 @@ from pathlib import Path
 from PIL import Image, ImageDraw, ImageFont
 import numpy as np
 
+# Numba is optional: it compiles the subtitle blend to a parallel SIMD loop,
+# otherwise a vectorized numpy blend is used
+try:
+    from numba import njit, prange
+    _NUMBA_AVAILABLE = True
+except ImportError:
+    _NUMBA_AVAILABLE = False
+
 
 def get_font(size: int = 32):
     """Get a suitable font for subtitles."""
@@ -57,8 +65,22 @@ def add_subtitle_to_frame(
     if frame.mode != "RGBA":
         frame = frame.convert("RGBA")
     
-    # Create overlay
-    overlay = Image.new("RGBA", frame.size, (0, 0, 0, 0))
+    overlay = _render_overlay(frame.size, text, position, font_size, text_color, bg_color, padding)
+    
+    # Composite
+    result = Image.alpha_composite(frame, overlay)
+    return result.convert("RGB")
+
+
+def _render_overlay(size, text, position, font_size, text_color, bg_color, padding):
+    """
+    Draw a subtitle (background box and text) on a transparent overlay.
+    
+    Returns:
+        RGBA overlay Image of `size`
+    """
+    width, height = size
+    overlay = Image.new("RGBA", size, (0, 0, 0, 0))
     draw = ImageDraw.Draw(overlay)
     font = get_font(font_size)
     
@@ -68,14 +90,14 @@ def add_subtitle_to_frame(
     text_height = bbox[3] - bbox[1]
     
     # Calculate position
-    x = (frame.width - text_width) // 2
+    x = (width - text_width) // 2
     
     if position == "bottom":
-        y = frame.height - text_height - padding * 3
+        y = height - text_height - padding * 3
     elif position == "top":
         y = padding * 2
     else:  # center
-        y = (frame.height - text_height) // 2
+        y = (height - text_height) // 2
     
     # Draw background rectangle
     bg_rect = [
@@ -89,9 +111,66 @@ def add_subtitle_to_frame(
     # Draw text
     draw.text((x, y), text, font=font, fill=text_color)
     
-    # Composite
-    result = Image.alpha_composite(frame, overlay)
-    return result.convert("RGB")
+    return overlay
+
+
+def _render_sprite(size, text, position="bottom", font_size=24,
+                   text_color=(255, 255, 255), bg_color=(0, 0, 0, 180), padding=10):
+    """
+    Prerender a subtitle as an RGBA sprite cropped to its box.
+    
+    Returns:
+        (uint8 array of shape (h, w, 4), top, left) or None if the box is
+        entirely off-frame
+    """
+    overlay = _render_overlay(size, text, position, font_size, text_color, bg_color, padding)
+    box = overlay.getchannel("A").getbbox()
+    if box is None:
+        return None
+    left, top = box[0], box[1]
+    sprite = np.asarray(overlay.crop(box), dtype=np.uint8)
+    return np.ascontiguousarray(sprite), top, left
+
+
+def _blend_numpy(frame, sprite, top, left):
+    """Alpha-blend an RGBA sprite into an RGB uint8 frame in place."""
+    h, w = sprite.shape[:2]
+    region = frame[top:top + h, left:left + w].astype(np.float32)
+    alpha = sprite[..., 3:].astype(np.float32) / 255.0
+    region += (sprite[..., :3] - region) * alpha
+    region += 0.5
+    frame[top:top + h, left:left + w] = region.astype(np.uint8)
+
+
+if _NUMBA_AVAILABLE:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _blend(frame, sprite, top, left):
+        """Alpha-blend an RGBA sprite into an RGB uint8 frame in place."""
+        h, w = sprite.shape[0], sprite.shape[1]
+        for y in prange(h):
+            for x in range(w):
+                a = sprite[y, x, 3] / 255.0
+                if a == 0.0:
+                    continue
+                for c in range(3):
+                    value = frame[top + y, left + x, c] * (1.0 - a) + sprite[y, x, c] * a
+                    frame[top + y, left + x, c] = np.uint8(value + 0.5)
+else:
+    _blend = _blend_numpy
+
+
+def _to_rgb_array(frame):
+    """Get an HxWx3 uint8 array for a PIL Image or numpy frame."""
+    if isinstance(frame, Image.Image):
+        return np.asarray(frame.convert("RGB"))
+    
+    from utils.video import to_uint8
+    arr = to_uint8(np.asarray(frame))
+    if arr.ndim == 2:
+        arr = arr[..., None]
+    if arr.shape[-1] == 1:
+        return np.repeat(arr, 3, axis=2)
+    return arr[..., :3]
 
 
 def add_subtitles_to_video(
@@ -219,23 +298,24 @@ def add_subtitles_to_frames(
     Add AI-generated subtitles to video frames.
     Works with subtitle format from TranslateGemma: [{"start": 0.0, "end": 2.0, "text": "..."}]
     
+    Each subtitle is rasterized once into an RGBA sprite and blended into
+    every frame it covers (with Numba when installed).
+    
     Args:
-        frames: List of frames (PIL Image or numpy array)
+        frames: Iterable of frames (PIL Image or numpy array)
         subtitles: List of subtitle dicts with 'start', 'end', 'text' keys
         fps: Frames per second
         position: Subtitle position ("bottom", "top", "center")
         font_size: Font size for subtitles
     
     Returns:
-        List of frames with subtitles overlay
+        List of HxWx3 uint8 numpy frames with subtitles overlay
     """
     result_frames = []
+    sprites = {}  # (text, frame size) -> prerendered sprite
     
     for i, frame in enumerate(frames):
-        # Convert numpy to PIL if needed
-        if isinstance(frame, np.ndarray):
-            frame = Image.fromarray(frame)
-        
+        frame = _to_rgb_array(frame)
         current_time = i / fps
         
         # Find active subtitle for this frame
@@ -250,12 +330,19 @@ def add_subtitles_to_frames(
         
         # Add subtitle if active
         if active_text:
-            frame = add_subtitle_to_frame(
-                frame, 
-                active_text, 
-                position=position,
-                font_size=font_size
-            )
+            height, width = frame.shape[:2]
+            key = (active_text, width, height)
+            if key not in sprites:
+                sprites[key] = _render_sprite(
+                    (width, height),
+                    active_text,
+                    position=position,
+                    font_size=font_size
+                )
+            if sprites[key] is not None:
+                # Blend into a private copy; the input frame may be shared
+                frame = np.array(frame)
+                _blend(frame, *sprites[key])
         
         result_frames.append(frame)
     
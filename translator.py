@@ -3,10 +3,9 @@ TranslateGemma Multi-language Translation Module.
 Handles translation of non-English prompts to English for video generation.
 Uses HuggingFace Inference API for lightweight deployment.
 """
-import os
 from typing import Dict, Optional
 from huggingface_hub import InferenceClient
-from . import HF_TOKEN
+from . import get_hf_token
 
 
 class PromptTranslator:
@@ -21,7 +20,7 @@ class PromptTranslator:
     def _get_client(self):
         """Get or create the inference client."""
         if self.client is None:
-            token = HF_TOKEN or os.getenv("HF_TOKEN")
+            token = get_hf_token()
             if not token:
                 raise ValueError("HuggingFace token not set. Set HF_TOKEN environment variable.")
             self.client = InferenceClient(token=token)
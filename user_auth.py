@@ -354,19 +354,54 @@ def destroy_session(session_token: str):
         _save_sessions(sessions)
 
 
-def get_current_user() -> Optional[Dict]:
-    """Get currently logged-in user from Streamlit session state."""
+def _session_memo() -> Optional[Dict]:
+    """
+    Get the user and expiry for this browser session's token.
+    
+    The session and user files are read once per token and the result is
+    kept in st.session_state, so it lives and dies with the browser session
+    instead of being shared across users. Later reruns only compare the
+    stored expiry against the clock.
+    
+    Returns:
+        Dict with token, user and expires_at, or None if not logged in
+    """
     session_token = st.session_state.get("session_token")
     if not session_token:
         return None
     
-    return get_user_from_session(session_token)
+    memo = st.session_state.get("_session_memo")
+    if memo is None or memo["token"] != session_token:
+        if not validate_session(session_token):
+            return None
+        session = _load_sessions().get(session_token)
+        if not session:
+            return None
+        memo = {
+            "token": session_token,
+            "user": _load_users().get(session["user_id"]),
+            "expires_at": datetime.fromisoformat(session["expires_at"]),
+        }
+        st.session_state["_session_memo"] = memo
+    
+    if datetime.now() > memo["expires_at"]:
+        # Let validate_session remove the expired entry from storage
+        validate_session(session_token)
+        del st.session_state["_session_memo"]
+        return None
+    
+    return memo
+
+
+def get_current_user() -> Optional[Dict]:
+    """Get currently logged-in user from Streamlit session state."""
+    memo = _session_memo()
+    return memo["user"] if memo else None
 
 
 def is_logged_in() -> bool:
     """Check if current user is logged in with valid session."""
-    session_token = st.session_state.get("session_token")
-    return validate_session(session_token)
+    return _session_memo() is not None
 
 
 def logout():
@@ -380,6 +415,8 @@ def logout():
         del st.session_state["session_token"]
     if "current_user" in st.session_state:
         del st.session_state["current_user"]
+    if "_session_memo" in st.session_state:
+        del st.session_state["_session_memo"]
 
 
 def generate_profile_logo(name: str, size: int = 50) -> str:
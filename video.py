@@ -2,10 +2,17 @@
 Video processing utilities.
 """
 import os
+import subprocess
 import imageio
+import imageio_ffmpeg
 from datetime import datetime
 from pathlib import Path
 
+FFMPEG_EXE = imageio_ffmpeg.get_ffmpeg_exe()
+
+# Pipe buffer for raw frames sent to ffmpeg (fewer, larger write() calls)
+PIPE_BUFSIZE = 1 << 20
+
 
 def ensure_output_dir():
     """Ensure outputs directory exists."""
@@ -20,53 +27,152 @@ def generate_filename(prefix: str = "video") -> str:
     return f"{prefix}_{timestamp}.mp4"
 
 
-def save_video_from_frames(frames, output_path: str, fps: int = 8):
+def to_uint8(arr, normalized: bool = None, scratch=None):
+    """
+    Convert a frame or clip to uint8, rounding to nearest.
+    
+    Args:
+        arr: numpy array of any dtype
+        normalized: True if float values are in [0, 1], False if already
+            0-255, None to decide with one max() over the whole array
+        scratch: Optional float32 buffer of arr's shape, reused across calls
+            (may be arr itself when arr is a float32 array the caller owns)
+    
+    Returns:
+        uint8 array of arr's shape
+    """
+    import numpy as np
+    
+    if arr.dtype == np.uint8:
+        return arr
+    if arr.dtype.kind != "f":
+        return arr.astype(np.uint8)
+    
+    if normalized is None:
+        normalized = arr.max() <= 1.0
+    if scratch is None or scratch.shape != arr.shape:
+        scratch = np.empty(arr.shape, dtype=np.float32)
+    
+    # Scale, clip before the cast (no wrap-around), round instead of truncate
+    np.multiply(arr, 255.0 if normalized else 1.0, out=scratch, casting="unsafe")
+    np.clip(scratch, 0, 255, out=scratch)
+    np.rint(scratch, out=scratch)
+    return scratch.astype(np.uint8)
+
+
+# ffmpeg rawvideo pixel format by channel count (2D frames are grayscale)
+_PIX_FMTS = {None: "gray", 1: "gray", 3: "rgb24", 4: "rgba"}
+
+
+def _channels(frame):
+    """Channel count of an (H, W) or (H, W, C) frame (None for 2D)."""
+    return frame.shape[2] if frame.ndim == 3 else None
+
+
+def _to_uint8_frame(frame, normalized: bool = None, scratch=None):
+    """Convert one PIL Image / tensor / array frame to a contiguous uint8 array."""
+    import numpy as np
+    from PIL import Image
+    
+    if isinstance(frame, Image.Image):
+        # asarray wraps the buffer PIL exports; np.array would copy it again
+        frame = np.asarray(frame)
+    elif hasattr(frame, 'numpy'):
+        # Handle torch tensors
+        frame = frame.numpy()
+    else:
+        frame = np.asarray(frame)
+    
+    # Handle float32/float64 frames from diffusion models
+    return np.ascontiguousarray(to_uint8(frame, normalized, scratch))
+
+
+def save_video_from_frames(frames, output_path: str, fps: int = 8, normalized: bool = None):
     """
     Save video frames to MP4 file.
     
+    Frames are streamed into ffmpeg's stdin as they are produced, so a
+    generator only ever holds one frame in memory.
+    
     Args:
-        frames: List of PIL Images or numpy arrays
+        frames: Iterable of PIL Images or numpy arrays
         output_path: Path to save the video
         fps: Frames per second
+        normalized: Whether float frames are in [0, 1] (see to_uint8);
+            None checks every frame's range
     
     Returns:
         Path to saved video
     """
+    import tempfile
+    
     import numpy as np
-    from PIL import Image
     
-    # Convert frames to numpy arrays if needed
-    numpy_frames = []
-    for frame in frames:
-        if isinstance(frame, Image.Image):
-            frame = np.array(frame)
-        elif hasattr(frame, 'numpy'):
-            # Handle torch tensors
-            frame = frame.numpy()
-        elif not isinstance(frame, np.ndarray):
-            frame = np.array(frame)
-        
-        # Handle float32/float64 frames from diffusion models
-        if frame.dtype in [np.float32, np.float64]:
-            # Check if range is 0-1 or 0-255
-            if frame.max() <= 1.0:
-                frame = (frame * 255).astype(np.uint8)
-            else:
-                frame = frame.clip(0, 255).astype(np.uint8)
-        elif frame.dtype != np.uint8:
-            frame = frame.astype(np.uint8)
-        
-        # Ensure 3D array (H, W, C)
-        if frame.ndim == 2:
-            frame = np.stack([frame, frame, frame], axis=-1)
-        
-        numpy_frames.append(frame)
-    
-    # Write video
-    writer = imageio.get_writer(output_path, fps=fps, codec='libx264')
-    for frame in numpy_frames:
-        writer.append_data(frame)
-    writer.close()
+    frames = iter(frames)
+    scratch = None  # float32 buffer shared by every float frame
+    try:
+        first = next(frames)
+    except StopIteration:
+        raise ValueError("No frames to save") from None
+    if isinstance(first, np.ndarray) and first.dtype.kind == "f":
+        scratch = np.empty(first.shape, dtype=np.float32)
+    first = _to_uint8_frame(first, normalized, scratch)
+    height, width = first.shape[:2]
+    channels = _channels(first)
+    
+    def frame_bytes(frame):
+        """Raw bytes of a frame in the stream's pixel layout."""
+        if _channels(frame) == channels:
+            return frame.data
+        if channels == 3 and _channels(frame) in (None, 1):
+            # Grayscale frame in an RGB stream: expand from a zero-copy view
+            gray = frame.reshape(height, width, 1)
+            return np.ascontiguousarray(np.broadcast_to(gray, (height, width, 3))).data
+        raise ValueError(f"Frame layout {frame.shape} does not match stream layout {first.shape}")
+    
+    cmd = [
+        FFMPEG_EXE,
+        "-f", "rawvideo",
+        "-pix_fmt", _PIX_FMTS[channels],
+        "-s", f"{width}x{height}",
+        "-r", str(fps),
+        "-i", "-",
+        "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2",  # yuv420p needs even sizes
+        "-c:v", "libx264",
+        "-pix_fmt", "yuv420p",
+        "-threads", "0",
+        "-y",
+        output_path
+    ]
+    
+    # stderr goes to a file: a full stderr pipe could block ffmpeg while we
+    # are blocked writing frames to it
+    with tempfile.TemporaryFile() as log:
+        proc = subprocess.Popen(
+            cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+            stderr=log, bufsize=PIPE_BUFSIZE
+        )
+        try:
+            proc.stdin.write(first.data)
+            for frame in frames:
+                proc.stdin.write(frame_bytes(_to_uint8_frame(frame, normalized, scratch)))
+            proc.stdin.close()
+        except BrokenPipeError:
+            pass  # ffmpeg exited early; its log explains why
+        except BaseException:
+            # The frame source failed: stop ffmpeg rather than leave it
+            # waiting on an open stdin forever
+            proc.kill()
+            try:
+                proc.stdin.close()
+            except OSError:
+                pass
+            proc.wait()
+            raise
+        returncode = proc.wait()
+        if returncode != 0:
+            log.seek(0)
+            raise subprocess.CalledProcessError(returncode, cmd, stderr=log.read())
     
     return output_path
 